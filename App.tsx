@@ -57,7 +57,7 @@ import TableSelector from './components/TableSelector';
 import SignatureModal from './components/SignatureModal';
 import { Language, translations } from './utils/i18n';
 import { saveToIndexedDB, getFromIndexedDB } from './utils/storage';
-import { pingBackend, fetchWithRetry, convertUrlToPdf, convertHtmlToPdf, BackendPageData, renderPdfPage, uploadPDFToBackend, editTextAtRect } from './utils/api';
+import { pingBackend, fetchWithRetry, fetchPageText, convertUrlToPdf, convertHtmlToPdf, BackendPageData, renderPdfPage, uploadPDFToBackend, editTextAtRect } from './utils/api';
 import UrlToPdfModal from './components/UrlToPdfModal';
 import HtmlToPdfModal from './components/HtmlToPdfModal';
 import { t as i18n } from './utils/i18n';
@@ -952,6 +952,28 @@ const App: React.FC = () => {
 
   const handlePdfUploadTrigger = () => pdfInputRef.current?.click();
 
+  // Lazy uploads return page sizes only; each page's text spans are fetched
+  // in page order in the background, so the document shows up right away
+  const loadPageTexts = async (sessionId: string, pages: PDFPage[]) => {
+    const queue = pages.filter(p => p.textPending);
+    const worker = async () => {
+      while (queue.length > 0) {
+        const page = queue.shift()!;
+        try {
+          const { fonts, blocks } = await fetchPageText(sessionId, page.pageNumber);
+          setEditorState(prev => prev.sessionId !== sessionId ? prev : {
+            ...prev,
+            fonts: fonts ? { ...fonts, ...prev.fonts } : prev.fonts,
+            pages: prev.pages.map(p => p.id === page.id ? { ...p, blocks, textPending: false } : p)
+          });
+        } catch (err) {
+          console.warn(`Failed to load text for page ${page.pageNumber}`, err);
+        }
+      }
+    };
+    await Promise.all(Array.from({ length: 2 }, worker));
+  };
+
   const handlePdfFileChange = async (e: React.ChangeEvent<HTMLInputElement>) => {
     const file = e.target.files?.[0];
     if (file) {
@@ -968,6 +990,7 @@ const App: React.FC = () => {
               id: `page-pdf-${idx}-${Date.now()}`,
               pageNumber: idx + 1,
               blocks: p.blocks,
+              textPending: !!result.lazy,
               width: p.width || 595,
               height: p.height || 842,
               elements: [
@@ -999,6 +1022,7 @@ const App: React.FC = () => {
 
           setExportStatus(null);
           showToast(language === 'pt' ? 'PDF importado com sucesso!' : 'PDF imported successfully!', 'success');
+          loadPageTexts(result.sessionId, finalPages);
         }
       } catch (err: any) {
         setExportStatus(null);
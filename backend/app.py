@@ -1,8 +1,29 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
+import glob
 import os
+import re
+import shutil
 import uuid
-from pdf_editor import AdvancedPDFEditor
+import hashlib
+import atexit
+import functools
+from contextlib import contextmanager
+import json
+from document_pool import SessionBusyError, SessionConflictError, create_default_pool
+from document_workers import DocumentRouter, OperationContext, SharedImage, document_change_hook
+from idempotency_store import CLAIMED, IN_PROGRESS, MISMATCH, IdempotencyStore
+from job_queue import JobCancelled, JobQueue, SUCCEEDED
+from content_store import ContentStore
+from payload_format import (
+    COLUMNAR_JSON_MIMETYPE, COLUMNAR_MSGPACK_MIMETYPE, JSON_MIMETYPE, NDJSON_MIMETYPE,
+    pack_msgpack, supported_mimetypes, to_columnar
+)
+from pdf_editor import AdvancedPDFEditor, merge_page_extractions, read_revisions
+from session_manager import SessionManager
+from session_store import SessionStore
+from single_flight import SingleFlight
+from render_cache import HAS_PILLOW, IMAGE_MIMETYPES, RenderCache
 from word_converter import WordConverter
 
 app = Flask(__name__)
@@ -16,14 +37,213 @@ if not os.path.exists(UPLOAD_FOLDER):
 if not os.path.exists(WORD_FOLDER):
     os.makedirs(WORD_FOLDER)
 
-# Store active editors in memory (simple session management for MVP)
-# In production, use Redis or database
-editors = {}
+# Uploaded PDFs stored once per content hash, plus cached extraction results
+content_store = ContentStore(UPLOAD_FOLDER)
+
+# Rendered page images, keyed by the revision at which each page last changed
+RENDER_CACHE_DIR = os.path.join(UPLOAD_FOLDER, 'render_cache')
+RENDER_CACHE_MEMORY_BYTES = int(os.getenv('RENDER_CACHE_MEMORY_MB', 128)) * 1024 * 1024
+RENDER_CACHE_DISK_BYTES = int(os.getenv('RENDER_CACHE_DISK_MB', 1024)) * 1024 * 1024
+render_cache = RenderCache(RENDER_CACHE_DIR, max_memory_bytes=RENDER_CACHE_MEMORY_BYTES,
+                           max_disk_bytes=RENDER_CACHE_DISK_BYTES)
+
+# Session metadata lives in SQLite so any gunicorn worker can serve any session
+SESSION_DB_PATH = os.getenv('SESSION_DB_PATH', os.path.join(UPLOAD_FOLDER, 'sessions.sqlite3'))
+session_store = SessionStore(SESSION_DB_PATH)
+
+# Open documents are kept in a bounded LRU pool keyed by session ID so
+# repeated edits and renders do not reparse the PDF on every request. Edits
+# drop cached renders of the pages they touched and publish the new revision
+_on_document_change = document_change_hook(render_cache, session_store)
+document_pool = create_default_pool(
+    opener=lambda path: AdvancedPDFEditor(path, on_change=_on_document_change)
+)
+
+# Document operations run on that pool, or with PDF_WORKERS=N on N worker
+# processes that each own a consistent-hash shard of the sessions
+documents = DocumentRouter(
+    document_pool, OperationContext(render_cache),
+    workers=int(os.getenv('PDF_WORKERS', 0)),
+    worker_config={
+        'renderCacheDir': RENDER_CACHE_DIR,
+        'renderCacheMemoryBytes': RENDER_CACHE_MEMORY_BYTES,
+        'renderCacheDiskBytes': RENDER_CACHE_DISK_BYTES,
+        'sessionDb': SESSION_DB_PATH,
+    },
+)
+atexit.register(documents.close)
+
+def _shareable_render(result):
+    """Followers of a coalesced render get bytes; a worker's shared memory handle is the leader's alone"""
+    image, width, height, revision = result
+    if isinstance(image, SharedImage):
+        image = bytes(image.view())
+    return image, width, height, revision
+
+# Identical concurrent renders and extractions (client retries, component
+# re-mounts) wait for the one in flight instead of repeating the work
+render_flights = SingleFlight(share=_shareable_render)
+extraction_flights = SingleFlight()
+
+# Responses of edits sent with an Idempotency-Key, so a client retry after a
+# lost response is answered from the record instead of editing twice
+idempotency_store = IdempotencyStore(
+    os.getenv('IDEMPOTENCY_DB_PATH', os.path.join(UPLOAD_FOLDER, 'idempotency.sqlite3')),
+    ttl_seconds=int(float(os.getenv('IDEMPOTENCY_TTL_HOURS', 24)) * 3600),
+    max_entries=int(os.getenv('IDEMPOTENCY_MAX_ENTRIES', 10000)),
+)
+IDEMPOTENCY_WAIT_SECONDS = int(os.getenv('IDEMPOTENCY_WAIT_SECONDS', 30))
+
+# Session lifecycle: TTL expiry, disk budget and a background janitor
+session_manager = SessionManager(
+    UPLOAD_FOLDER, WORD_FOLDER, documents, render_cache, content_store, session_store,
+    ttl_seconds=int(float(os.getenv('SESSION_TTL_HOURS', 6)) * 3600),
+    disk_budget_bytes=int(os.getenv('STORAGE_BUDGET_MB', 2048)) * 1024 * 1024,
+    interval_seconds=int(os.getenv('JANITOR_INTERVAL_SECONDS', 300)),
+)
+session_manager.start_janitor()
+
+@app.errorhandler(SessionConflictError)
+def session_conflict(error):
+    """Another worker saved the session over edits that were still in memory here"""
+    return jsonify({'error': 'Session changed in another worker', 'detail': str(error)}), 409
+
+@app.errorhandler(SessionBusyError)
+def session_busy(error):
+    """Another worker holds unflushed edits to the session and did not flush them in time"""
+    response = jsonify({'error': 'Session is busy in another worker', 'detail': str(error)})
+    response.headers['Retry-After'] = '1'
+    return response, 503
 
 @app.route('/', methods=['GET'])
 def health_check():
     return jsonify({"status": "healthy", "service": "pdfsim-api"}), 200
 
+@app.route('/sessions/<session_id>', methods=['GET'])
+def get_session(session_id):
+    """Session metadata from the shared store, as seen by every worker"""
+    if session_manager.resolve(session_id) is None:
+        return jsonify({'error': 'Session expired or invalid'}), 404
+    metadata = session_manager.metadata(session_id)
+    if metadata is None:
+        return jsonify({'error': 'Session expired or invalid'}), 404
+    return jsonify(metadata)
+
+@app.route('/stats', methods=['GET'])
+def service_stats():
+    """Session counts, storage, cache usage, coalesced and replayed requests and background jobs"""
+    stats = session_manager.stats()
+    stats['jobs'] = job_queue.stats()
+    stats['coalescing'] = {'render': render_flights.stats(), 'extraction': extraction_flights.stats()}
+    stats['idempotency'] = idempotency_store.stats()
+    return jsonify(stats)
+
+def _wants_lazy_extraction():
+    """True when the client asked for extract=lazy (query string, form or JSON body)"""
+    value = request.args.get('extract') or request.form.get('extract')
+    if value is None and request.is_json:
+        value = (request.get_json(silent=True) or {}).get('extract')
+    return value == 'lazy'
+
+def _extraction_response(payload, plain=None):
+    """
+    Serialize extraction results in the format negotiated via Accept.
+
+    Plain JSON (the default) sends ``plain`` if given, else ``payload``;
+    the columnar JSON and MessagePack formats always encode ``payload``,
+    which must have a "pages" list.
+    """
+    mimetype = request.accept_mimetypes.best_match(supported_mimetypes(), default=JSON_MIMETYPE)
+    if mimetype == COLUMNAR_MSGPACK_MIMETYPE:
+        response = Response(pack_msgpack(payload), mimetype=COLUMNAR_MSGPACK_MIMETYPE)
+    elif mimetype == COLUMNAR_JSON_MIMETYPE:
+        response = jsonify(to_columnar(payload))
+        response.mimetype = COLUMNAR_JSON_MIMETYPE
+    else:
+        response = jsonify(plain if plain is not None else payload)
+    response.vary.add('Accept')
+    return response
+
+def _wants_ndjson():
+    """True when the client explicitly prefers a streamed NDJSON response"""
+    return request.accept_mimetypes.best_match([JSON_MIMETYPE, NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+def _ndjson_line(obj):
+    return json.dumps(obj, separators=(',', ':')) + '\n'
+
+def _stream_pages_response(session_id, pdf_path, start, end, header):
+    """
+    Stream extraction as NDJSON: ``header``, then one {"type": "page"} line per
+    page as soon as it is extracted, then {"type": "done", "fonts": {...}}.
+
+    Each page is a separate document operation, so other requests on
+    the session interleave with a long stream, and pages are not memoized so
+    server memory stays flat regardless of page count.
+    """
+    def generate():
+        yield _ndjson_line(header)
+        fonts = {}
+        try:
+            for page_num in range(start, end + 1):
+                page_data = documents.call(session_id, pdf_path, 'extract_page', page_num, memoize=False)
+                if page_data is None:
+                    break
+                for font_name, info in page_data.get('fonts', {}).items():
+                    fonts.setdefault(font_name, info)
+                yield _ndjson_line(dict(page_data, type='page'))
+        except Exception as e:
+            print(f'Error streaming extraction: {e}')
+            yield _ndjson_line({'type': 'error', 'error': str(e)})
+            return
+        yield _ndjson_line({'type': 'done', 'fonts': fonts})
+    
+    response = Response(generate(), mimetype=NDJSON_MIMETYPE)
+    response.headers['X-Accel-Buffering'] = 'no'  # let proxies pass lines through as they come
+    response.vary.add('Accept')
+    return response
+
+def _start_session_response(session_id, pdf_path, content_hash=None):
+    """
+    Open a new session in the pool and describe it to the client.
+
+    By default the whole document is extracted up front. With extract=lazy
+    only the page count and sizes are returned and span data is fetched
+    per page from /pages/<session>/<n>/text. With Accept: application/x-ndjson
+    pages are streamed as they are extracted. When the content hash is known,
+    extraction results are shared by every upload of the same bytes.
+    """
+    info = documents.call(session_id, pdf_path, 'describe')
+    page_count = info['pageCount']
+    session_manager.register(session_id, pageCount=page_count, revision=info['revision'],
+                             **({'contentHash': content_hash} if content_hash else {}))
+    if _wants_ndjson() and not _wants_lazy_extraction():
+        header = {'type': 'session', 'sessionId': session_id, 'pageCount': page_count}
+        return _stream_pages_response(session_id, pdf_path, 1, page_count, header)
+    
+    cached_pages = content_store.get_extraction(content_hash) if content_hash else None
+    prepared = documents.call(session_id, pdf_path, 'prepare_session', cached_pages,
+                              _wants_lazy_extraction(), bool(content_hash))
+    if 'pages' in prepared:
+        return jsonify({
+            'sessionId': session_id,
+            'pageCount': len(prepared['pages']),
+            'pages': prepared['pages'],
+            'lazy': True
+        })
+    if cached_pages is not None:
+        extraction_result = merge_page_extractions(cached_pages)
+    else:
+        extraction_result = prepared['extraction']
+        if content_hash:
+            content_store.put_extraction(content_hash, prepared['pageData'])
+    
+    return _extraction_response({
+        'sessionId': session_id,
+        'pageCount': len(extraction_result['pages']),
+        'pages': extraction_result['pages'],
+        'fonts': extraction_result.get('fonts', {})
+    })
+
 @app.route('/upload', methods=['POST'])
 def upload_pdf():
     if 'file' not in request.files:
@@ -32,25 +252,81 @@ def upload_pdf():
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
     
+    # Hash while streaming to disk; identical uploads share one stored copy
     filename = str(uuid.uuid4()) + '.pdf'
     filepath = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(filepath)
-    
-    # Initialize editor
-    editor = AdvancedPDFEditor(filepath)
-    editors[filename] = editor
-    
-    # Extract initial analysis
-    extraction_result = editor.extract_text()
-    editor.close() 
+    content_hash, _ = content_store.save_stream(file.stream, session_path=filepath)
     
-    return jsonify({
-        'sessionId': filename,
-        'pages': extraction_result['pages'],
-        'fonts': extraction_result.get('fonts', {})
-    })
+    return _start_session_response(filename, filepath, content_hash)
+
+def _expected_revision(data):
+    """
+    Optional expectedRevision from an edit request, for optimistic concurrency.
+
+    Returns (revision or None, error response or None).
+    """
+    value = data.get('expectedRevision')
+    if value is None:
+        return None, None
+    try:
+        return int(value), None
+    except (TypeError, ValueError):
+        return None, (jsonify({'error': 'expectedRevision must be an integer'}), 400)
+
+def _revision_conflict(outcome):
+    """409 response when an edit was refused because the document moved past the client's revision"""
+    if not outcome['conflict']:
+        return None
+    return jsonify({'error': 'Revision conflict', 'revision': outcome['revision']}), 409
+
+def idempotent(view):
+    """
+    Honours an Idempotency-Key header on a mutating endpoint.
+
+    The first request with a key runs and its response is recorded; a retry
+    with the same key and body gets that response again, marked with
+    Idempotent-Replayed, without touching the document. A retry that
+    arrives while the first is still running waits for it. Server errors
+    are not recorded, so the client may retry those.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > 255:
+            return jsonify({'error': 'Idempotency-Key must be at most 255 characters'}), 400
+
+        fingerprint = hashlib.sha256(
+            request.method.encode() + b' ' + request.path.encode() + b'\n' + request.get_data()
+        ).hexdigest()
+        outcome, record = idempotency_store.wait(key, fingerprint, IDEMPOTENCY_WAIT_SECONDS)
+        if outcome == MISMATCH:
+            return jsonify({'error': 'Idempotency-Key was already used for a different request'}), 422
+        if outcome == IN_PROGRESS:
+            return jsonify({'error': 'A request with this Idempotency-Key is still in progress'}), 409
+        if outcome != CLAIMED:
+            response = Response(record['body'], status=record['status'], mimetype=record['mimetype'])
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except BaseException:
+            idempotency_store.release(key)
+            raise
+        if response.status_code >= 500:
+            idempotency_store.release(key)
+            return response
+        body = response.get_data()
+        payload = response.get_json(silent=True)
+        revision = payload.get('revision') if isinstance(payload, dict) else None
+        idempotency_store.complete(key, response.status_code, body, response.mimetype, revision)
+        return response
+    return wrapper
 
 @app.route('/edit/replace', methods=['POST'])
+@idempotent
 def replace_text():
     data = request.json
     session_id = data.get('sessionId')
@@ -59,18 +335,24 @@ def replace_text():
     
     if not session_id or not old_text:
         return jsonify({'error': 'Missing parameters'}), 400
+    expected_revision, error = _expected_revision(data)
+    if error:
+        return error
         
-    filepath = os.path.join(UPLOAD_FOLDER, session_id)
-    if not os.path.exists(filepath):
+    filepath = session_manager.resolve(session_id)
+    if filepath is None:
         return jsonify({'error': 'Session expired or invalid'}), 404
         
-    editor = AdvancedPDFEditor(filepath)
-    success = editor.replace_text(old_text, new_text)
-    editor.close()
+    outcome = documents.call(session_id, filepath, 'edit', 'replace_text', expected_revision,
+                             old_text, new_text, write=True)
+    conflict = _revision_conflict(outcome)
+    if conflict:
+        return conflict
     
-    return jsonify({'success': success})
+    return jsonify({'success': outcome['result'], 'revision': outcome['revision']})
 
 @app.route('/edit/rect', methods=['POST'])
+@idempotent
 def edit_text_rect():
     data = request.json
     session_id = data.get('sessionId')
@@ -84,13 +366,17 @@ def edit_text_rect():
     
     if not session_id or page_num is None or not rect:
         return jsonify({'error': 'Missing parameters'}), 400
+    expected_revision, error = _expected_revision(data)
+    if error:
+        return error
         
-    filepath = os.path.join(UPLOAD_FOLDER, session_id)
-    if not os.path.exists(filepath):
+    filepath = session_manager.resolve(session_id)
+    if filepath is None:
         return jsonify({'error': 'Session expired or invalid'}), 404
         
-    editor = AdvancedPDFEditor(filepath)
-    success = editor.edit_text_at_rect(
+    outcome = documents.call(
+        session_id, filepath, 'edit', 'edit_text_at_rect', expected_revision,
+        write=True,
         page_num=page_num,
         rect=rect,
         new_text=new_text,
@@ -99,16 +385,95 @@ def edit_text_rect():
         color=color,
         origin=origin
     )
-    editor.close()
+    conflict = _revision_conflict(outcome)
+    if conflict:
+        return conflict
+    
+    return jsonify({'success': outcome['result'], 'revision': outcome['revision']})
+
+@app.route('/search', methods=['POST'])
+def search_text():
+    """Find text in a session; only pages the text index allows are scanned"""
+    data = request.json
+    session_id = data.get('sessionId')
+    query = data.get('query')
+    
+    if not session_id or not query:
+        return jsonify({'error': 'Missing parameters'}), 400
+        
+    filepath = session_manager.resolve(session_id)
+    if filepath is None:
+        return jsonify({'error': 'Session expired or invalid'}), 404
+        
+    hits = documents.call(session_id, filepath, 'search', query)
     
-    return jsonify({'success': success})
+    return jsonify({
+        'query': query,
+        'count': sum(len(h['rects']) for h in hits),
+        'hits': hits
+    })
+
+# Request field names (camelCase) -> AdvancedPDFEditor.apply_operations keys
+BATCH_OP_FIELDS = {
+    'type': 'type',
+    'pageNumber': 'page_num',
+    'rect': 'rect',
+    'oldText': 'old_text',
+    'newText': 'new_text',
+    'text': 'text',
+    'x': 'x',
+    'y': 'y',
+    'fontName': 'font_name',
+    'fontSize': 'font_size',
+    'color': 'color',
+    'origin': 'origin',
+}
+
+@app.route('/edit/batch', methods=['POST'])
+@idempotent
+def edit_batch():
+    """Apply many replace/delete/add/rect edits with one open and one save"""
+    data = request.json
+    session_id = data.get('sessionId')
+    operations = data.get('operations')
+
+    if not session_id or not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'Missing parameters'}), 400
+    expected_revision, error = _expected_revision(data)
+    if error:
+        return error
+
+    filepath = session_manager.resolve(session_id)
+    if filepath is None:
+        return jsonify({'error': 'Session expired or invalid'}), 404
+
+    # Malformed entries stay in place so results line up with the request
+    ops = [
+        {BATCH_OP_FIELDS[k]: v for k, v in op.items() if k in BATCH_OP_FIELDS} if isinstance(op, dict) else op
+        for op in operations
+    ]
+
+    outcome = documents.call(session_id, filepath, 'edit', 'apply_operations', expected_revision,
+                             ops, write=True)
+    conflict = _revision_conflict(outcome)
+    if conflict:
+        return conflict
+
+    return jsonify(dict(outcome['result'], revision=outcome['revision']))
 
 @app.route('/download/<session_id>', methods=['GET'])
 def download_pdf(session_id):
-    filepath = os.path.join(UPLOAD_FOLDER, session_id)
-    if not os.path.exists(filepath):
+    filepath = session_manager.resolve(session_id)
+    if filepath is None:
         return jsonify({'error': 'File not found'}), 404
-    return send_file(filepath, as_attachment=True, download_name='edited_document.pdf')
+    # Fold incremental updates into a clean, compacted file before it leaves
+    documents.call(session_id, filepath, 'compact', write=True)
+    # Open under the read lock: the descriptor keeps this version even if an
+    # edit replaces the file while the response is still streaming
+    with documents.reading(session_id, filepath):
+        pdf_file = open(filepath, 'rb')
+    return send_file(pdf_file, mimetype='application/pdf', as_attachment=True,
+                     download_name='edited_document.pdf')
 
 @app.route('/convert/pdf-to-word', methods=['POST'])
 def convert_pdf_to_word():
@@ -119,28 +484,85 @@ def convert_pdf_to_word():
     if not session_id:
         return jsonify({'error': 'Missing sessionId'}), 400
     
-    pdf_path = os.path.join(UPLOAD_FOLDER, session_id)
-    if not os.path.exists(pdf_path):
+    pdf_path = session_manager.resolve(session_id)
+    if pdf_path is None:
         return jsonify({'error': 'PDF file not found'}), 404
     
-    # Generate unique filename for Word document
-    word_filename = f"{os.path.splitext(session_id)[0]}.docx"
-    word_path = os.path.join(WORD_FOLDER, word_filename)
+    # Optional page range (1-based, inclusive)
+    try:
+        start_page = int(data['startPage']) if data.get('startPage') is not None else None
+        end_page = int(data['endPage']) if data.get('endPage') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'startPage and endPage must be integers'}), 400
     
-    # Convert PDF to Word
-    converter = WordConverter()
-    success = converter.pdf_to_word(pdf_path, word_path)
+    if _wants_async():
+        return _job_accepted('pdf-to-word', {'sessionId': session_id, 'pdfPath': pdf_path,
+                                             'startPage': start_page, 'endPage': end_page})
     
-    if not success:
+    # Convert PDF to Word
+    word_path = _convert_to_word(session_id, pdf_path, start_page, end_page)
+    if word_path is None:
         return jsonify({'error': 'Conversion failed'}), 500
     
     # Return the Word file for download
-    return send_file(
-        word_path,
-        as_attachment=True,
-        download_name='documento_editavel.docx',
-        mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-    )
+    return _send_word_file(word_path)
+
+WORD_EXPORT_NAME = re.compile(r'^(?P<stem>.+)\.r(?P<revision>\d+)(\.p[^.]+)?\.docx$')
+
+def _word_export_path(session_id, revision, start_page=None, end_page=None):
+    """word_files/<session>.r<revision>[.p<start>-<end>].docx"""
+    stem = os.path.splitext(session_id)[0]
+    pages = f".p{start_page or 1}-{end_page or 'end'}" if start_page or end_page else ""
+    return os.path.join(WORD_FOLDER, f"{stem}.r{revision}{pages}.docx")
+
+def _convert_to_word(session_id, pdf_path, start_page=None, end_page=None, cancelled=None):
+    """
+    Exports the session's current revision unless that revision and range is
+    already cached, then drops exports of older revisions. Returns the .docx
+    path, or None on failure or once ``cancelled()`` returns True.
+    """
+    # pdf2docx reads the file, so deferred edits must reach disk first
+    documents.flush(session_id)
+    with documents.reading(session_id, pdf_path):
+        revision = read_revisions(pdf_path)['revision']
+        word_path = _word_export_path(session_id, revision, start_page, end_page)
+        if os.path.exists(word_path):
+            return word_path
+        # Convert from a hard link so edits during the conversion cannot
+        # change the input: the next in-place save copies the file first
+        snapshot = f"{pdf_path}.{uuid.uuid4().hex}.snap"
+        try:
+            os.link(pdf_path, snapshot)
+        except OSError:
+            shutil.copyfile(pdf_path, snapshot)
+    try:
+        if not WordConverter.pdf_to_word(snapshot, word_path, start_page, end_page, cancelled=cancelled):
+            return None
+    finally:
+        try:
+            os.remove(snapshot)
+        except OSError:
+            pass
+    if cancelled is not None and cancelled():
+        # Cancelled while the DOCX was being written: nothing should point at it
+        try:
+            os.remove(word_path)
+        except OSError:
+            pass
+        return None
+    stem, revision = WORD_EXPORT_NAME.match(os.path.basename(word_path)).group('stem', 'revision')
+    for path in _word_exports(stem):
+        match = WORD_EXPORT_NAME.match(os.path.basename(path))
+        if match is None or match.group('revision') != revision:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    session_manager.update(session_id, wordExport=os.path.basename(word_path))
+    return word_path
+
+def _word_exports(stem):
+    return glob.glob(os.path.join(WORD_FOLDER, glob.escape(stem) + '.*docx'))
 
 @app.route('/convert/word-to-pdf', methods=['POST'])
 def convert_word_to_pdf():
@@ -164,32 +586,40 @@ def convert_word_to_pdf():
     pdf_filename = str(uuid.uuid4()) + '.pdf'
     pdf_path = os.path.join(UPLOAD_FOLDER, pdf_filename)
     
+    if _wants_async():
+        return _job_accepted('word-to-pdf', {'wordPath': word_path, 'pdfPath': pdf_path,
+                                             'sessionId': pdf_filename})
+    
     converter = WordConverter()
     success = converter.word_to_pdf(word_path, pdf_path)
     
     if not success:
         return jsonify({'error': 'Conversion failed'}), 500
     
-    # Extract text from converted PDF for editing
-    editor = AdvancedPDFEditor(pdf_path)
-    extraction_result = editor.extract_text()
-    editor.close()
-    
-    return jsonify({
-        'sessionId': pdf_filename,
-        'pages': extraction_result['pages'],
-        'fonts': extraction_result.get('fonts', {})
-    })
+    return _start_session_response(pdf_filename, pdf_path)
 
 @app.route('/download/word/<session_id>', methods=['GET'])
 def download_word(session_id):
     """Download Word file associated with session"""
-    word_filename = f"{os.path.splitext(session_id)[0]}.docx"
-    word_path = os.path.join(WORD_FOLDER, word_filename)
-    
-    if not os.path.exists(word_path):
-        return jsonify({'error': 'Word file not found'}), 404
+    pdf_path = session_manager.resolve(session_id)
+    word_path = None
+    if pdf_path is not None:
+        word_path = _word_export_path(session_id, read_revisions(pdf_path)['revision'])
+    if (word_path is None or not os.path.exists(word_path)) and pdf_path is not None:
+        # The session's last export, whichever worker produced it
+        metadata = session_manager.metadata(session_id)
+        if metadata and metadata['wordExport']:
+            word_path = os.path.join(WORD_FOLDER, metadata['wordExport'])
+    if word_path is None or not os.path.exists(word_path):
+        # Fall back to the most recent export of any revision or range
+        exports = _word_exports(os.path.splitext(os.path.basename(session_id))[0])
+        if not exports:
+            return jsonify({'error': 'Word file not found'}), 404
+        word_path = max(exports, key=os.path.getmtime)
     
+    return _send_word_file(word_path)
+
+def _send_word_file(word_path):
     return send_file(
         word_path,
         as_attachment=True,
@@ -197,6 +627,37 @@ def download_word(session_id):
         mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
     )
 
+# Deep-zoom tiles: level z renders at TILE_BASE_DPI * 2**z, cut into
+# TILE_SIZE x TILE_SIZE pixel tiles counted from the page's top-left corner
+TILE_SIZE = 256
+TILE_BASE_DPI = 72
+TILE_MAX_ZOOM = int(os.getenv('TILE_MAX_ZOOM', 6))
+
+def _render_page_image(session_id, pdf_path, page_num, dpi, fmt, tile=None, revision=None):
+    """
+    Render one page on the session's document through the render cache.
+
+    ``tile`` is an optional (zoom, x, y) triple; the page is then clipped
+    to that tile so only the visible part is rasterized. Concurrent calls
+    for the same page revision, DPI, format and tile share one render;
+    pass the page ``revision`` if already known.
+
+    Returns (image, width, height, page_revision), where image is bytes or,
+    for large renders by a worker process, a SharedImage that must be
+    streamed or released. Raises ValueError for an out-of-range page or tile.
+    """
+    if revision is None:
+        revision = read_revisions(pdf_path)['pages'].get(page_num, 0)
+    key = (session_id, revision, page_num, float(dpi), fmt, tile)
+    return render_flights.do(key, lambda: documents.render(session_id, pdf_path, session_id, page_num, dpi, fmt,
+                                                           tile=tile, tile_size=TILE_SIZE))
+
+def _extract(session_id, pdf_path, op, *args, **kwargs):
+    """A text extraction operation, shared with identical ones in flight for the same revision"""
+    revision = read_revisions(pdf_path)['revision']
+    key = (session_id, revision, op, args, tuple(sorted(kwargs.items())))
+    return extraction_flights.do(key, lambda: documents.call(session_id, pdf_path, op, *args, **kwargs))
+
 @app.route('/render-page', methods=['POST'])
 def render_page():
     """Render PDF page as high-quality image for background"""
@@ -208,40 +669,26 @@ def render_page():
     if not session_id:
         return jsonify({'error': 'Missing sessionId'}), 400
     
-    pdf_path = os.path.join(UPLOAD_FOLDER, session_id)
-    if not os.path.exists(pdf_path):
+    pdf_path = session_manager.resolve(session_id)
+    if pdf_path is None:
         return jsonify({'error': 'PDF not found'}), 404
     
     try:
-        import fitz  # PyMuPDF
         import base64
         
-        # Open PDF
-        doc = fitz.open(pdf_path)
-        
-        # Validate page number
-        if page_num < 1 or page_num > len(doc):
-            doc.close()
-            return jsonify({'error': f'Invalid page number. PDF has {len(doc)} pages'}), 400
-        
-        # Get page
-        page = doc[page_num - 1]
-        
-        # Render at specified DPI (higher = better quality)
-        mat = fitz.Matrix(dpi/72, dpi/72)
-        pix = page.get_pixmap(matrix=mat, alpha=False)
-        
-        # Convert to PNG bytes
-        img_bytes = pix.tobytes("png")
-        
-        # Encode as base64
-        img_base64 = base64.b64encode(img_bytes).decode('utf-8')
+        try:
+            image, width, height, _ = _render_page_image(session_id, pdf_path, page_num, dpi, 'png')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Get dimensions
-        width = pix.width
-        height = pix.height
-        
-        doc.close()
+        # Encode as base64, straight from shared memory for worker renders
+        if isinstance(image, SharedImage):
+            try:
+                img_base64 = base64.b64encode(image.view()).decode('utf-8')
+            finally:
+                image.release()
+        else:
+            img_base64 = base64.b64encode(image).decode('utf-8')
         
         return jsonify({
             'image': f'data:image/png;base64,{img_base64}',
@@ -254,6 +701,132 @@ def render_page():
         print(f'Error rendering page: {e}')
         return jsonify({'error': f'Failed to render page: {str(e)}'}), 500
 
+def _page_etag(session_id, revision, page_num, dpi, fmt, tile_id=''):
+    """Strong ETag for a page image; changes only when that page is edited"""
+    tag = f'{session_id}:{revision}:{page_num}:{float(dpi):g}:{fmt}:{tile_id}'
+    return hashlib.sha1(tag.encode('utf-8')).hexdigest()
+
+def _image_response(status, etag, body=None, mimetype=None):
+    if isinstance(body, SharedImage):
+        # Stream the worker's shared memory segment without copying it into this process
+        response = Response(body.wsgi_body(request.environ), status=status, mimetype=mimetype,
+                            direct_passthrough=True)
+        response.content_length = body.size
+    else:
+        response = Response(body, status=status, mimetype=mimetype)
+    response.set_etag(etag)
+    # URLs do not carry the revision, so caches must revalidate every time
+    response.headers['Cache-Control'] = 'public, no-cache'
+    return response
+
+@app.route('/pages/<session_id>/<int:page_num>.<any(png, jpg, webp):fmt>', methods=['GET'])
+def get_page_image(session_id, page_num, fmt):
+    """Serve a rendered page as raw image bytes with revision-based ETags"""
+    dpi = request.args.get('dpi', 150, type=float)
+    
+    pdf_path = session_manager.resolve(session_id)
+    if pdf_path is None:
+        return jsonify({'error': 'PDF not found'}), 404
+    
+    if fmt == 'webp' and not HAS_PILLOW:
+        return jsonify({'error': 'WebP output requires Pillow on the server'}), 406
+    
+    # The revision sidecar is enough to answer conditional requests,
+    # so repeat views never touch the PDF
+    revision = read_revisions(pdf_path)['pages'].get(page_num, 0)
+    etag = _page_etag(session_id, revision, page_num, dpi, fmt)
+    if request.if_none_match.contains(etag):
+        return _image_response(304, etag)
+    
+    try:
+        img_bytes, _, _, revision = _render_page_image(session_id, pdf_path, page_num, dpi, fmt,
+                                                       revision=revision)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f'Error rendering page: {e}')
+        return jsonify({'error': f'Failed to render page: {str(e)}'}), 500
+    
+    etag = _page_etag(session_id, revision, page_num, dpi, fmt)
+    return _image_response(200, etag, img_bytes, IMAGE_MIMETYPES[fmt])
+
+@app.route('/tiles/<session_id>/<int:page_num>/<int:zoom>/<int:tx>/<int:ty>.<any(png, jpg, webp):fmt>', methods=['GET'])
+def get_page_tile(session_id, page_num, zoom, tx, ty, fmt):
+    """
+    Serve one TILE_SIZE px tile of a page at a discrete zoom level.
+
+    Zoom level z renders at TILE_BASE_DPI * 2**z, so a page of width W
+    points spans ceil(W * 2**z * TILE_BASE_DPI / 72 / TILE_SIZE) tiles across.
+    Tiles share the page render cache and ETag scheme.
+    """
+    if zoom > TILE_MAX_ZOOM:
+        return jsonify({'error': f'Zoom level must be between 0 and {TILE_MAX_ZOOM}'}), 400
+    dpi = TILE_BASE_DPI * 2 ** zoom
+    tile_id = f'{zoom}_{tx}_{ty}'
+    
+    pdf_path = session_manager.resolve(session_id)
+    if pdf_path is None:
+        return jsonify({'error': 'PDF not found'}), 404
+    
+    if fmt == 'webp' and not HAS_PILLOW:
+        return jsonify({'error': 'WebP output requires Pillow on the server'}), 406
+    
+    revision = read_revisions(pdf_path)['pages'].get(page_num, 0)
+    etag = _page_etag(session_id, revision, page_num, dpi, fmt, tile_id)
+    if request.if_none_match.contains(etag):
+        return _image_response(304, etag)
+    
+    try:
+        img_bytes, _, _, revision = _render_page_image(
+            session_id, pdf_path, page_num, dpi, fmt, tile=(zoom, tx, ty), revision=revision
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        print(f'Error rendering tile: {e}')
+        return jsonify({'error': f'Failed to render tile: {str(e)}'}), 500
+    
+    etag = _page_etag(session_id, revision, page_num, dpi, fmt, tile_id)
+    return _image_response(200, etag, img_bytes, IMAGE_MIMETYPES[fmt])
+
+@app.route('/pages/<session_id>/<int:page_num>/text', methods=['GET'])
+def get_page_text(session_id, page_num):
+    """Text spans and fonts for one page, extracted on demand and cached"""
+    pdf_path = session_manager.resolve(session_id)
+    if pdf_path is None:
+        return jsonify({'error': 'PDF not found'}), 404
+    
+    page_data = _extract(session_id, pdf_path, 'extract_page', page_num)
+    if page_data is None:
+        page_count = documents.call(session_id, pdf_path, 'describe')['pageCount']
+        return jsonify({'error': f'Invalid page number. PDF has {page_count} pages'}), 400
+    
+    return _extraction_response(merge_page_extractions([page_data]), plain=page_data)
+
+@app.route('/pages/<session_id>/text', methods=['GET'])
+def get_pages_text(session_id):
+    """Text spans for a page range (?start=&end=, 1-based, inclusive)"""
+    start = request.args.get('start', 1, type=int)
+    end = request.args.get('end', type=int)
+    
+    pdf_path = session_manager.resolve(session_id)
+    if pdf_path is None:
+        return jsonify({'error': 'PDF not found'}), 404
+    
+    if _wants_ndjson():
+        page_count = documents.call(session_id, pdf_path, 'describe')['pageCount']
+        end = page_count if end is None else min(end, page_count)
+        header = {'type': 'session', 'sessionId': session_id, 'pageCount': page_count}
+        return _stream_pages_response(session_id, pdf_path, max(start, 1), end, header)
+    
+    extraction_result = _extract(session_id, pdf_path, 'extract_text', start=start, end=end)
+    
+    return _extraction_response({
+        'sessionId': session_id,
+        'pages': extraction_result['pages'],
+        'fonts': extraction_result.get('fonts', {})
+    })
+
 # import stripe
 # from dotenv import load_dotenv
 # 
@@ -394,7 +967,7 @@ def send_pdf_email():
         print(f"Error sending email: {str(e)}")
         return jsonify({'error': f"Erro ao enviar email: {str(e)}"}), 500
 
-from url_to_pdf import sync_convert_url_to_pdf
+from url_to_pdf import sync_convert_html_to_pdf_bytes, sync_convert_url_to_pdf
 
 @app.route('/convert/url-to-pdf', methods=['POST'])
 def convert_url_to_pdf():
@@ -411,24 +984,15 @@ def convert_url_to_pdf():
     filename = str(uuid.uuid4()) + '.pdf'
     filepath = os.path.join(UPLOAD_FOLDER, filename)
     
+    if _wants_async():
+        return _job_accepted('url-to-pdf', {'url': url, 'pdfPath': filepath, 'sessionId': filename})
+    
     success = sync_convert_url_to_pdf(url, filepath)
     
     if not success:
         return jsonify({'error': 'Failed to convert URL to PDF'}), 500
         
-    # Initialize editor
-    editor = AdvancedPDFEditor(filepath)
-    editors[filename] = editor
-    
-    # Extract initial analysis
-    extraction_result = editor.extract_text()
-    editor.close() 
-    
-    return jsonify({
-        'sessionId': filename,
-        'pages': extraction_result['pages'],
-        'fonts': extraction_result.get('fonts', {})
-    })
+    return _start_session_response(filename, filepath)
 
 @app.route('/convert/html-to-pdf', methods=['POST'])
 def convert_html_to_pdf():
@@ -445,36 +1009,160 @@ def convert_html_to_pdf():
     filename = str(uuid.uuid4()) + '.pdf'
     filepath = os.path.join(UPLOAD_FOLDER, filename)
     
-    # We need to adapt URLToPDFConverter to handle direct HTML content
-    # or just use a temporary file approach.
-    temp_html = os.path.join(UPLOAD_FOLDER, str(uuid.uuid4()) + '.html')
-    with open(temp_html, 'w', encoding='utf-8') as f:
-        f.write(html_content)
-    
-    # Convert using the existing file-based approach (file:/// path)
-    abs_path = os.path.abspath(temp_html)
-    success = sync_convert_url_to_pdf(f"file:///{abs_path}", filepath)
-    
-    # Clean up temp HTML
-    if os.path.exists(temp_html):
-        os.remove(temp_html)
+    if _wants_async():
+        # The markup travels in the job record, so no temp file is needed
+        return _job_accepted('html-to-pdf', {'html': html_content, 'pdfPath': filepath,
+                                             'sessionId': filename})
     
-    if not success:
+    # Rendered in memory; the PDF bytes are written once and parsed from memory
+    pdf_bytes = sync_convert_html_to_pdf_bytes(html_content)
+    if pdf_bytes is None:
         return jsonify({'error': 'Failed to convert HTML to PDF'}), 500
-        
-    # Initialize editor
-    editor = AdvancedPDFEditor(filepath)
-    editors[filename] = editor
     
-    # Extract initial analysis
-    extraction_result = editor.extract_text()
-    editor.close() 
+    _open_session_from_bytes(filename, filepath, pdf_bytes)
+    return _start_session_response(filename, filepath)
+
+def _open_session_from_bytes(session_id, pdf_path, pdf_bytes):
+    """Writes a new session file and pools an editor parsed from the same bytes"""
+    with open(pdf_path, 'wb') as f:
+        f.write(pdf_bytes)
+    editor = AdvancedPDFEditor(pdf_path, on_change=_on_document_change, stream=pdf_bytes)
+    documents.adopt(session_id, pdf_path, editor)
+
+# Background jobs: slow conversions can run asynchronously (async=1) and be
+# polled via /jobs/<id>; state lives in SQLite so queued jobs survive restarts
+
+@contextmanager
+def _new_session_job(job):
+    """
+    Wraps a job that writes a new session file. A job that is cancelled or
+    fails leaves nothing behind under uploads.
+    """
+    try:
+        yield
+        job.check_cancelled()
+    except BaseException:
+        session_manager.remove_session(job.params['sessionId'])
+        raise
+
+def _pdf_to_word_job(job):
+    word_path = _convert_to_word(job.params['sessionId'], job.params['pdfPath'],
+                                 job.params.get('startPage'), job.params.get('endPage'),
+                                 cancelled=job.is_cancelled)
+    if word_path is None:
+        job.check_cancelled()
+        raise RuntimeError('Conversion failed')
+    return {'kind': 'word', 'wordFile': os.path.basename(word_path)}
+
+def _word_to_pdf_job(job):
+    try:
+        with _new_session_job(job):
+            job.check_cancelled()
+            if not WordConverter.word_to_pdf(job.params['wordPath'], job.params['pdfPath']):
+                raise RuntimeError('Conversion failed')
+    except JobCancelled:
+        # The uploaded .docx is only this job's input
+        try:
+            os.remove(job.params['wordPath'])
+        except OSError:
+            pass
+        raise
+    return {'kind': 'session', 'sessionId': job.params['sessionId']}
+
+def _url_to_pdf_job(job):
+    with _new_session_job(job):
+        job.check_cancelled()
+        if not sync_convert_url_to_pdf(job.params['url'], job.params['pdfPath']):
+            raise RuntimeError('Failed to convert URL to PDF')
+    return {'kind': 'session', 'sessionId': job.params['sessionId']}
+
+def _html_to_pdf_job(job):
+    with _new_session_job(job):
+        job.check_cancelled()
+        pdf_bytes = sync_convert_html_to_pdf_bytes(job.params['html'])
+        if pdf_bytes is None:
+            raise RuntimeError('Failed to convert HTML to PDF')
+        job.check_cancelled()
+        _open_session_from_bytes(job.params['sessionId'], job.params['pdfPath'], pdf_bytes)
+    return {'kind': 'session', 'sessionId': job.params['sessionId']}
+
+job_queue = JobQueue(os.getenv('JOB_DB_PATH', os.path.join(UPLOAD_FOLDER, 'jobs.sqlite3')))
+job_queue.register('pdf-to-word', _pdf_to_word_job, int(os.getenv('JOB_LIMIT_PDF_TO_WORD', 2)))
+job_queue.register('word-to-pdf', _word_to_pdf_job, int(os.getenv('JOB_LIMIT_WORD_TO_PDF', 1)))
+job_queue.register('url-to-pdf', _url_to_pdf_job, int(os.getenv('JOB_LIMIT_URL_TO_PDF', 2)))
+job_queue.register('html-to-pdf', _html_to_pdf_job, int(os.getenv('JOB_LIMIT_HTML_TO_PDF', 2)))
+job_queue.start()
+
+def _wants_async():
+    """True when the client asked for async=1 (query string, form or JSON body)"""
+    value = request.args.get('async') or request.form.get('async')
+    if value is None and request.is_json:
+        value = (request.get_json(silent=True) or {}).get('async')
+    return str(value).lower() in ('1', 'true')
+
+def _job_state(job):
+    """Public view of a job; server-side paths in its params are never exposed"""
+    state = {
+        'jobId': job['id'],
+        'type': job['type'],
+        'status': job['status'],
+        'statusUrl': f"/jobs/{job['id']}",
+        'createdAt': job['createdAt'],
+        'startedAt': job['startedAt'],
+        'finishedAt': job['finishedAt'],
+    }
+    if job['error']:
+        state['error'] = job['error']
+    if job['status'] == SUCCEEDED:
+        state['resultUrl'] = f"/jobs/{job['id']}/result"
+    return state
+
+def _job_accepted(job_type, params):
+    job_id = job_queue.submit(job_type, params)
+    response = jsonify(_job_state(job_queue.get(job_id)))
+    response.status_code = 202
+    response.headers['Location'] = f"/jobs/{job_id}"
+    return response
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Poll the status of a background job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(_job_state(job))
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running job"""
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(_job_state(job))
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """
+    Result of a finished job: the .docx for pdf-to-word, otherwise a new
+    editor session exactly like the synchronous endpoint returns.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] != SUCCEEDED:
+        return jsonify({'error': f"Job is {job['status']}", 'status': job['status']}), 409
     
-    return jsonify({
-        'sessionId': filename,
-        'pages': extraction_result['pages'],
-        'fonts': extraction_result.get('fonts', {})
-    })
+    result = job['result']
+    if result['kind'] == 'word':
+        word_path = os.path.join(WORD_FOLDER, result['wordFile'])
+        if not os.path.exists(word_path):
+            return jsonify({'error': 'Word file not found'}), 410
+        return _send_word_file(word_path)
+    
+    pdf_path = session_manager.resolve(result['sessionId'])
+    if pdf_path is None:
+        return jsonify({'error': 'PDF file not found'}), 410
+    return _start_session_response(result['sessionId'], pdf_path)
 
 if __name__ == '__main__':
     # Use PORT from environment for cloud deployment
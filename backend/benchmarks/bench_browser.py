@@ -0,0 +1,96 @@
+"""
+URL to PDF Benchmark
+Times converting a local page with a fresh Playwright + Chromium per
+request (the old URLToPDFConverter behaviour) versus the warm browser pool.
+
+Usage (from backend/):
+    python benchmarks/bench_browser.py [--renders 20]
+
+Needs Chromium installed for Playwright (python -m playwright install chromium).
+"""
+import argparse
+import asyncio
+import http.server
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playwright.async_api import async_playwright
+from url_to_pdf import browser_pool
+
+PAGE = """<!doctype html><html><head><title>Invoice</title></head><body>
+<h1>Invoice 2024-001</h1>
+<table>{rows}</table>
+</body></html>"""
+
+
+async def cold_convert(url: str, output_path: str):
+    """The pre-pool implementation: start Playwright and Chromium every time."""
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+        await page.goto(url, wait_until="networkidle", timeout=60000)
+        await page.pdf(path=output_path, format="A4", print_background=True)
+        await browser.close()
+
+
+def serve(directory: str) -> http.server.ThreadingHTTPServer:
+    handler = partial(http.server.SimpleHTTPRequestHandler, directory=directory)
+    handler.log_message = lambda *args: None
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def report(label: str, timings):
+    timings = sorted(timings)
+    print(f"{label:>12}: median {timings[len(timings) // 2] * 1000:7.1f} ms, "
+          f"max {timings[-1] * 1000:7.1f} ms over {len(timings)} renders")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--renders', type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="pdfsim-bench-")
+    server = serve(workdir)
+    try:
+        rows = "".join(f"<tr><td>Item {i}</td><td>{i * 3}.00</td></tr>" for i in range(200))
+        with open(os.path.join(workdir, "invoice.html"), "w", encoding="utf-8") as f:
+            f.write(PAGE.format(rows=rows))
+        urls = {
+            "http": f"http://127.0.0.1:{server.server_address[1]}/invoice.html",
+            "file": "file://" + os.path.join(workdir, "invoice.html"),
+        }
+        output = os.path.join(workdir, "out.pdf")
+
+        for scheme, url in urls.items():
+            timings = []
+            for _ in range(args.renders):
+                start = time.perf_counter()
+                asyncio.run(cold_convert(url, output))
+                timings.append(time.perf_counter() - start)
+            report(f"cold {scheme}", timings)
+
+            browser_pool.render(url, output)  # Start the service outside the timing
+            timings = []
+            for _ in range(args.renders):
+                start = time.perf_counter()
+                browser_pool.render(url, output)
+                timings.append(time.perf_counter() - start)
+            report(f"pooled {scheme}", timings)
+    finally:
+        browser_pool.close()
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Extraction Scaling Benchmark
+Times full-document text extraction serially and across 1..N worker
+processes.
+
+Usage (from backend/):
+    python benchmarks/bench_extract.py [--pages 500] [--max-workers N]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extraction
+from bench_save import make_document
+from pdf_editor import AdvancedPDFEditor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=500)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="pdfsim-bench-")
+    try:
+        path = os.path.join(workdir, "document.pdf")
+        make_document(path, args.pages)
+
+        editor = AdvancedPDFEditor(path)
+        start = time.perf_counter()
+        serial = editor.extract_text()
+        serial_s = time.perf_counter() - start
+        editor.close()
+        print(f"{'workers':>8} {'seconds':>9} {'speedup':>8}")
+        print(f"{'serial':>8} {serial_s:>9.2f} {1.0:>8.2f}")
+
+        for workers in range(1, args.max_workers + 1):
+            # A fresh pool per worker count; warm it up so process spawn is not timed
+            extraction._executor = None
+            extraction.EXTRACT_WORKERS = workers
+            extraction.extract_pages_parallel(path, min(args.pages, workers), workers)
+            start = time.perf_counter()
+            pages = extraction.extract_pages_parallel(path, args.pages, workers)
+            elapsed = time.perf_counter() - start
+            extraction._executor.shutdown()
+            assert [p["page"] for p in pages] == [p["page"] for p in serial["pages"]]
+            print(f"{workers:>8} {elapsed:>9.2f} {serial_s / elapsed:>8.2f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
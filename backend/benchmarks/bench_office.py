@@ -0,0 +1,94 @@
+"""
+Word to PDF Throughput Benchmark
+Converts a batch of DOCX files with a one-shot LibreOffice process per file
+(the old WordConverter behaviour) and with the pooled soffice listeners,
+sequentially and concurrently.
+
+Usage (from backend/):
+    python benchmarks/bench_office.py [--files 100] [--concurrency 4]
+
+Needs LibreOffice with its Python UNO bridge (python3-uno) for the pooled
+runs; run it with the Python interpreter that can import ``uno``.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+from office_pool import OfficePool, find_soffice
+from word_converter import WordConverter
+
+
+def make_documents(directory: str, count: int):
+    paths = []
+    for n in range(count):
+        document = Document()
+        document.add_heading(f"Contract {n + 1}", level=1)
+        for clause in range(30):
+            document.add_paragraph(f"{clause + 1}. The parties agree to the terms set out herein, "
+                                   f"including the schedule attached as annex {clause % 5 + 1}.")
+        path = os.path.join(directory, f"doc{n:03d}.docx")
+        document.save(path)
+        paths.append(path)
+    return paths
+
+
+def run(label: str, convert, paths, out_dir: str, concurrency: int):
+    outputs = [os.path.join(out_dir, os.path.basename(p)[:-5] + ".pdf") for p in paths]
+    start = time.perf_counter()
+    if concurrency == 1:
+        for path, output in zip(paths, outputs):
+            convert(path, output)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(convert, paths, outputs))
+    elapsed = time.perf_counter() - start
+    done = sum(1 for output in outputs if os.path.exists(output))
+    for output in outputs:
+        if os.path.exists(output):
+            os.remove(output)
+    print(f"{label:>24}: {elapsed:7.1f} s, {len(paths) / elapsed:6.2f} docs/s ({done}/{len(paths)} converted)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    if find_soffice() is None:
+        sys.exit("LibreOffice (soffice) not found on PATH")
+
+    workdir = tempfile.mkdtemp(prefix="pdfsim-bench-")
+    try:
+        paths = make_documents(workdir, args.files)
+        out_dir = os.path.join(workdir, "out")
+        os.makedirs(out_dir)
+
+        run("one-shot sequential", WordConverter._word_to_pdf_one_shot, paths, out_dir, 1)
+        run("one-shot concurrent", WordConverter._word_to_pdf_one_shot, paths, out_dir, args.concurrency)
+
+        pool = OfficePool(size=args.concurrency)
+        if not pool.available():
+            print("Python UNO bridge not importable; skipping pooled runs")
+            return
+        try:
+            # Start every listener outside the timings
+            warmup = paths[:args.concurrency]
+            run("pooled warm-up", pool.convert, warmup, out_dir, args.concurrency)
+            run("pooled sequential", pool.convert, paths, out_dir, 1)
+            run("pooled concurrent", pool.convert, paths, out_dir, args.concurrency)
+        finally:
+            pool.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
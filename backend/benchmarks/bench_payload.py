@@ -0,0 +1,73 @@
+"""
+Extraction Payload Benchmark
+Compares payload size and encode/decode time of the default JSON layout,
+the columnar JSON layout and columnar MessagePack.
+
+Usage (from backend/):
+    python benchmarks/bench_payload.py [--pages 200]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import payload_format
+from bench_save import make_document
+from pdf_editor import AdvancedPDFEditor
+
+
+def timed(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="pdfsim-bench-")
+    try:
+        path = os.path.join(workdir, "document.pdf")
+        make_document(path, args.pages)
+        editor = AdvancedPDFEditor(path)
+        payload = editor.extract_text()
+        editor.close()
+
+        rows = []
+        default_json = json.dumps(payload)
+        rows.append(("json", len(default_json),
+                     timed(lambda: json.dumps(payload)),
+                     timed(lambda: json.loads(default_json))))
+
+        columnar_json = json.dumps(payload_format.to_columnar(payload))
+        rows.append(("columnar json", len(columnar_json),
+                     timed(lambda: json.dumps(payload_format.to_columnar(payload))),
+                     timed(lambda: payload_format.from_columnar(json.loads(columnar_json)))))
+
+        if payload_format.HAS_MSGPACK:
+            packed = payload_format.pack_msgpack(payload)
+            rows.append(("columnar msgpack", len(packed),
+                         timed(lambda: payload_format.pack_msgpack(payload)),
+                         timed(lambda: payload_format.unpack_msgpack(packed))))
+        else:
+            print("msgpack not installed; skipping MessagePack row")
+
+        print(f"{'format':>18} {'KB':>9} {'encode ms':>10} {'decode ms':>10}")
+        for name, size, encode_ms, decode_ms in rows:
+            print(f"{name:>18} {size / 1024:>9.0f} {encode_ms:>10.1f} {decode_ms:>10.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Save Latency Benchmark
+Measures per-edit save latency with incremental updates versus full
+garbage-collected rewrites on 10-, 100- and 1000-page documents.
+
+Usage (from backend/):
+    python benchmarks/bench_save.py [--pages 10 100 1000] [--edits 20]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+from pdf_editor import AdvancedPDFEditor
+
+
+def make_document(path: str, pages: int):
+    """Builds a text-heavy document, roughly one résumé/contract page per page."""
+    doc = fitz.open()
+    for n in range(pages):
+        page = doc.new_page()
+        y = 72
+        for line in range(40):
+            page.insert_text((72, y), f"Page {n + 1} line {line + 1}: lorem ipsum dolor sit amet", fontsize=10)
+            y += 16
+    doc.save(path, garbage=3, deflate=True, clean=True)
+    doc.close()
+
+
+def time_edits(path: str, edits: int, incremental: bool) -> list:
+    editor = AdvancedPDFEditor(path, incremental=incremental)
+    editor._log = lambda message: None  # keep logging out of the measurement
+    timings = []
+    for i in range(edits):
+        page_num = (i % len(editor.doc)) + 1
+        start = time.perf_counter()
+        editor.edit_text_at_rect(page_num, [72, 62, 400, 76], f"Edited field {i}")
+        timings.append((time.perf_counter() - start) * 1000)
+    editor.close()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--edits', type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="pdfsim-bench-")
+    try:
+        print(f"{'pages':>6} {'mode':>12} {'median ms':>10} {'p95 ms':>10} {'file KB':>10}")
+        for pages in args.pages:
+            source = os.path.join(workdir, f"source-{pages}.pdf")
+            make_document(source, pages)
+            for mode, incremental in (("full", False), ("incremental", True)):
+                target = os.path.join(workdir, f"{mode}-{pages}.pdf")
+                shutil.copyfile(source, target)
+                timings = time_edits(target, args.edits, incremental)
+                p95 = sorted(timings)[int(len(timings) * 0.95) - 1]
+                size_kb = os.path.getsize(target) / 1024
+                print(f"{pages:>6} {mode:>12} {statistics.median(timings):>10.1f} {p95:>10.1f} {size_kb:>10.0f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Replace-All Benchmark
+Times replace-all on a long contract with a full page scan (the old
+replace_text behaviour) versus the per-session text index.
+
+Usage (from backend/):
+    python benchmarks/bench_search.py [--pages 1000] [--every 50]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+from pdf_editor import AdvancedPDFEditor
+
+NEEDLE = "Indemnifying Party"
+
+
+def make_contract(path: str, pages: int, every: int):
+    doc = fitz.open()
+    for n in range(pages):
+        page = doc.new_page()
+        y = 72
+        for line in range(40):
+            page.insert_text((72, y), f"{n + 1}.{line + 1} The parties agree to the terms set out herein.", fontsize=10)
+            y += 16
+        if n % every == 0:
+            page.insert_text((72, y), f"The {NEEDLE} shall hold harmless the other party.", fontsize=10)
+    doc.save(path, garbage=3, deflate=True, clean=True)
+    doc.close()
+
+
+def full_scan_replace(editor: AdvancedPDFEditor, needle: str):
+    """The pre-index implementation: search and apply redactions on every page."""
+    for page in editor.doc:
+        for rect in page.search_for(needle):
+            page.add_redact_annot(rect)
+        page.apply_redactions()
+    editor._safe_save()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=1000)
+    parser.add_argument('--every', type=int, default=50, help="put the needle on every Nth page")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="pdfsim-bench-")
+    try:
+        source = os.path.join(workdir, "contract.pdf")
+        make_contract(source, args.pages, args.every)
+
+        for mode in ("full scan", "indexed"):
+            path = os.path.join(workdir, mode.replace(" ", "-") + ".pdf")
+            shutil.copyfile(source, path)
+            editor = AdvancedPDFEditor(path)
+            editor._log = lambda message: None
+            # Upload already ran the extraction pass, which is what builds the index
+            start = time.perf_counter()
+            editor.extract_text()
+            extract_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            if mode == "full scan":
+                full_scan_replace(editor, NEEDLE)
+            else:
+                editor.replace_text(NEEDLE, "")
+            replace_s = time.perf_counter() - start
+            remaining = sum(len(p.search_for(NEEDLE)) for p in editor.doc)
+            editor.close()
+            print(f"{mode:>10}: replace-all {replace_s * 1000:8.1f} ms "
+                  f"(extraction pass {extract_s * 1000:.0f} ms, {remaining} hits left)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Document Worker Sharding Benchmark
+Renders pages of many sessions from concurrent threads, once with every
+document operation in this process and once routed to sharded worker
+processes.
+
+Usage (from backend/):
+    python benchmarks/bench_workers.py [--sessions 16] [--pages 20] [--workers 4] [--concurrency 8]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+
+from document_pool import DocumentPool
+from document_workers import DocumentRouter, OperationContext
+from render_cache import RenderCache
+
+
+def make_sessions(directory: str, count: int, pages: int):
+    source = os.path.join(directory, "source.pdf")
+    doc = fitz.open()
+    for n in range(pages):
+        page = doc.new_page()
+        for line in range(40):
+            page.insert_text((50, 60 + line * 18), f"Page {n + 1} line {line + 1}: the parties agree to the terms",
+                             fontsize=11)
+    doc.save(source)
+    doc.close()
+    paths = []
+    for n in range(count):
+        path = os.path.join(directory, f"session{n:03d}.pdf")
+        shutil.copyfile(source, path)
+        paths.append(path)
+    return paths
+
+
+def run(label: str, router: DocumentRouter, paths, pages: int, concurrency: int):
+    # A distinct DPI per request defeats the render cache, so every call rasterizes
+    requests = [(path, page, 100 + (i % 50)) for i, (path, page) in
+                enumerate((p, n) for n in range(1, pages + 1) for p in paths)]
+
+    def render(request):
+        path, page, dpi = request
+        router.call(os.path.basename(path), path, "render_page", os.path.basename(path), page, dpi, "png")
+
+    # Open every document (and start the workers) outside the timing
+    for path in paths:
+        router.call(os.path.basename(path), path, "describe")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(render, requests))
+    elapsed = time.perf_counter() - start
+    print(f"{label:>24}: {elapsed:7.2f} s, {len(requests) / elapsed:7.1f} renders/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=16)
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="pdfsim-bench-")
+    try:
+        paths = make_sessions(workdir, args.sessions, args.pages)
+        # Separate caches per run, so the second run cannot hit the first one's renders
+        disk_bytes = 1024 * 1024 * 1024
+        local_cache = RenderCache(os.path.join(workdir, "cache-local"), max_memory_bytes=0, max_disk_bytes=disk_bytes)
+        config = {'renderCacheDir': os.path.join(workdir, "cache-workers"),
+                  'renderCacheMemoryBytes': 0, 'renderCacheDiskBytes': disk_bytes}
+        context = OperationContext(local_cache)
+
+        in_process = DocumentRouter(DocumentPool(max_docs=args.sessions), context)
+        run("in-process threads", in_process, paths, args.pages, args.concurrency)
+        in_process.close()
+
+        sharded = DocumentRouter(DocumentPool(max_docs=args.sessions), context,
+                                 workers=args.workers, worker_config=config)
+        try:
+            run(f"{args.workers} sharded workers", sharded, paths, args.pages, args.concurrency)
+        finally:
+            sharded.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Content Store Module
+Content-addressed storage for uploaded PDFs and their extraction results
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class ContentStore:
+    """Stores each distinct upload once, keyed by its SHA-256.
+
+    Session files are hard links to the stored blob, so a repeated upload
+    costs no extra disk. Writers must call ensure_private() before modifying
+    a session file in place (copy-on-write); atomic replace-by-rename breaks
+    the link by itself.
+    """
+
+    def __init__(self, root: str):
+        self.blob_dir = os.path.join(root, "blobs")
+        self.extract_dir = os.path.join(root, "extract_cache")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.extract_dir, exist_ok=True)
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, f"{digest}.pdf")
+
+    def save_stream(self, stream: BinaryIO, session_path: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Streams an upload to disk while hashing it.
+
+        Returns (digest, blob_path). If the same content is already stored the
+        new copy is discarded. Given ``session_path``, the session file is
+        linked here as well: a stored blob no session links to may be
+        collected at any moment, so it is linked before the new copy goes.
+        """
+        sha = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=self.blob_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    sha.update(chunk)
+                    f.write(chunk)
+            digest = sha.hexdigest()
+            blob = self.blob_path(digest)
+            if session_path is not None and self._link(blob, session_path):
+                os.remove(temp_path)
+                return digest, blob
+            if os.path.exists(blob):
+                os.utime(blob)  # Restarts the collector's grace period for a reused blob
+                os.remove(temp_path)
+            else:
+                os.replace(temp_path, blob)
+            if session_path is not None:
+                self.link_session(digest, session_path)
+            return digest, blob
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    @staticmethod
+    def _link(blob: str, session_path: str) -> bool:
+        """Hard-links an existing blob; False if it is gone or links are unsupported."""
+        try:
+            os.link(blob, session_path)
+            return True
+        except OSError:
+            return False
+
+    def link_session(self, digest: str, session_path: str):
+        """Creates a session file sharing the blob's storage (copies if links are unsupported)."""
+        blob = self.blob_path(digest)
+        try:
+            os.link(blob, session_path)
+        except OSError:
+            shutil.copyfile(blob, session_path)
+
+    @staticmethod
+    def ensure_private(path: str) -> bool:
+        """
+        Breaks a hard link before the file is written in place.
+
+        Returns True if a private copy was made.
+        """
+        try:
+            if os.stat(path).st_nlink <= 1:
+                return False
+        except OSError:
+            return False
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".cow")
+        os.close(fd)
+        try:
+            shutil.copyfile(path, temp_path)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return True
+
+    def _extract_path(self, digest: str) -> str:
+        return os.path.join(self.extract_dir, f"{digest}.json")
+
+    def get_extraction(self, digest: str) -> Optional[List[Dict]]:
+        """Cached extract_page() results for unmodified content, if any."""
+        try:
+            with open(self._extract_path(digest), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put_extraction(self, digest: str, pages: List[Dict]):
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=self.extract_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(pages, f, separators=(",", ":"))
+            os.replace(temp_path, self._extract_path(digest))
+        except OSError as e:
+            print(f"✗ Error writing extraction cache for {digest}: {e}")
@@ -0,0 +1,458 @@
+"""
+Document Pool Module
+Keeps PDF documents open between requests so repeated edits and renders
+on the same session do not pay the parse cost every time
+"""
+import atexit
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from pdf_editor import AdvancedPDFEditor
+from session_lock import SessionLock
+
+
+class SessionConflictError(RuntimeError):
+    """
+    Deferred edits could not be flushed because another process saved the
+    session file first. The edits are kept in a conflict copy next to it.
+    """
+
+
+class SessionBusyError(RuntimeError):
+    """Another process kept unflushed edits to the session past the wait limit."""
+
+
+# How often a process waiting for another one's flush checks the dirty claim
+PEER_POLL_INTERVAL = 0.05
+
+
+def conflict_copy_path(pdf_path: str) -> str:
+    return f"{pdf_path}.{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}.conflict"
+
+
+class _PoolEntry:
+    """One open editor plus the lock that serializes access to it."""
+
+    __slots__ = ("pdf_path", "editor", "lock", "session_lock", "size", "users", "dirty_since", "last_change")
+
+    def __init__(self, pdf_path: str, session_lock: SessionLock):
+        self.pdf_path = pdf_path
+        self.session_lock = session_lock
+        self.editor: Optional[AdvancedPDFEditor] = None
+        self.lock = threading.RLock()
+        self.size = 0
+        self.users = 0
+        self.dirty_since: Optional[float] = None
+        self.last_change = 0.0
+
+    def is_open(self) -> bool:
+        return self.editor is not None and self.editor.doc is not None and not self.editor.doc.is_closed
+
+
+class DocumentPool:
+    """Session-keyed LRU pool of open AdvancedPDFEditor handles.
+
+    The pool is bounded both by number of open documents and by an estimate
+    of their memory footprint (the size of the file on disk). Handles that
+    are currently checked out are never evicted; eviction closes the
+    underlying fitz.Document cleanly.
+
+    With ``write_behind`` the editors keep edits in memory and a background
+    thread flushes a document once it has been idle for ``flush_delay``
+    seconds, or ``flush_max_delay`` seconds after its first unflushed edit
+    if edits keep coming. Eviction and close_all() flush as well.
+
+    Deferred edits stay safe across processes through the SessionLock's
+    dirty claim: the pool holding unflushed edits to a session holds the
+    claim until they are flushed, and any other process that needs the
+    session first asks it to flush and waits (up to ``peer_flush_timeout``
+    seconds, then SessionBusyError). A process that dies with the claim
+    loses only its own unflushed edits, and the next opener moves every
+    page to a fresh revision.
+
+    Every session also has a SessionLock shared by all threads and, through
+    its lock file, by other worker processes on the same uploads folder.
+    Readers (renders, extraction) share it; writers (edits, flushes,
+    compaction) hold it exclusively. A handle whose file was saved by
+    another process meanwhile is reopened before use, and is never flushed
+    over the newer file: its deferred edits go to a conflict copy and the
+    flush raises SessionConflictError. Lock order is the session lock, then
+    the entry lock; eviction runs outside both.
+    """
+
+    def __init__(self, max_docs: int = 16, max_bytes: int = 512 * 1024 * 1024,
+                 opener: Callable[[str], AdvancedPDFEditor] = AdvancedPDFEditor,
+                 write_behind: bool = False, flush_delay: float = 2.0, flush_max_delay: float = 10.0,
+                 peer_flush_timeout: float = 30.0):
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self._opener = opener
+        self.write_behind = write_behind
+        self.flush_delay = flush_delay
+        self.flush_max_delay = flush_max_delay
+        self.peer_flush_timeout = peer_flush_timeout
+        self._entries: "OrderedDict[str, _PoolEntry]" = OrderedDict()
+        self._session_locks: Dict[str, SessionLock] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._flushes = 0
+        self._reloads = 0
+        self._conflicts = 0
+        self._peer_waits = 0
+        self._flusher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _session_lock(self, session_id: str, pdf_path: str) -> SessionLock:
+        """Caller holds self._lock."""
+        lock = self._session_locks.get(session_id)
+        if lock is None:
+            lock = self._session_locks[session_id] = SessionLock(pdf_path)
+        return lock
+
+    @contextmanager
+    def reading(self, session_id: str, pdf_path: str) -> Iterator[None]:
+        """Shared session lock for code that reads the session file directly."""
+        with self._lock:
+            lock = self._session_lock(session_id, pdf_path)
+        with self._locked(lock, write=False):
+            yield
+
+    @contextmanager
+    def _locked(self, lock: SessionLock, write: bool) -> Iterator[None]:
+        """
+        Takes the session lock once no other process holds unflushed edits
+        to the session, asking it to flush first if one does.
+        """
+        deadline = time.monotonic() + self.peer_flush_timeout
+        while True:
+            self._wait_for_peer_flush(lock, deadline)
+            stack = ExitStack()
+            stack.enter_context(lock.write() if write else lock.read())
+            if not lock.peer_dirty():
+                break
+            stack.close()  # A peer edited again before we got the lock
+        with stack:
+            yield
+
+    def _wait_for_peer_flush(self, lock: SessionLock, deadline: float):
+        if not lock.peer_dirty():
+            return
+        with self._lock:
+            self._peer_waits += 1
+        lock.request_flush()
+        while lock.peer_dirty():
+            if time.monotonic() >= deadline:
+                raise SessionBusyError(f"{os.path.basename(lock.pdf_path)} has unflushed edits "
+                                       f"in another process")
+            time.sleep(PEER_POLL_INTERVAL)
+
+    @contextmanager
+    def acquire(self, session_id: str, pdf_path: str, write: bool = False) -> Iterator[AdvancedPDFEditor]:
+        """
+        Check out the editor for a session, opening the PDF if needed.
+
+        Callers that modify the document must pass ``write=True``; they then
+        hold the session exclusively. Readers share the session lock but are
+        still serialized on the handle itself, since a fitz.Document is not
+        safe to use from two threads at once.
+        """
+        entry = self._checkout(session_id, pdf_path)
+        try:
+            with self._locked(entry.session_lock, write):
+                with entry.lock:
+                    if entry.is_open() and entry.editor.is_stale():
+                        self._reload(entry)
+                    if not entry.is_open():
+                        with self._lock:
+                            self._misses += 1
+                        entry.editor = self._opener(pdf_path)
+                        entry.editor.write_behind = self.write_behind
+                    else:
+                        with self._lock:
+                            self._hits += 1
+                    try:
+                        yield entry.editor
+                    finally:
+                        if write:
+                            self._claim_unflushed(entry)
+        finally:
+            self._checkin(session_id, entry)
+
+    def _claim_unflushed(self, entry: _PoolEntry):
+        """
+        After a write, before the session lock is released: takes the dirty
+        claim for edits left in memory, or flushes them now when the claim
+        cannot be had or another process is waiting for the session. Edits
+        that cannot be flushed then go to a conflict copy and the write
+        fails, so it is never acknowledged. Caller holds entry.lock and the
+        session's write lock.
+        """
+        if not entry.is_open() or not entry.editor.has_unflushed_changes:
+            return
+        lock = entry.session_lock
+        if lock.flush_requested() or not lock.claim_dirty():
+            if not self._flush_entry(entry):
+                self._set_aside(entry, "could not be flushed")
+
+    def _reload(self, entry: _PoolEntry):
+        """
+        Drops a handle whose file another process has saved; the caller
+        reopens it. Unflushed edits on it are never dropped silently: they
+        go to a conflict copy and SessionConflictError is raised.
+        """
+        if entry.editor.has_unflushed_changes:
+            self._set_aside(entry)
+        try:
+            entry.editor.close()
+        except Exception as e:
+            print(f"✗ Error closing stale document {entry.pdf_path}: {e}")
+        entry.editor = None
+        entry.dirty_since = None
+        with self._lock:
+            self._reloads += 1
+
+    def _checkout(self, session_id: str, pdf_path: str) -> _PoolEntry:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or entry.pdf_path != pdf_path:
+                entry = _PoolEntry(pdf_path, self._session_lock(session_id, pdf_path))
+                self._entries[session_id] = entry
+            self._entries.move_to_end(session_id)
+            entry.users += 1
+            return entry
+
+    def _checkin(self, session_id: str, entry: _PoolEntry):
+        with self._lock:
+            entry.users -= 1
+            if not entry.is_open():
+                # Opening failed or the editor closed itself; forget the slot.
+                if entry.users == 0 and self._entries.get(session_id) is entry:
+                    del self._entries[session_id]
+            else:
+                try:
+                    entry.size = os.path.getsize(entry.pdf_path)
+                except OSError:
+                    pass
+                if entry.editor.has_unflushed_changes:
+                    now = time.time()
+                    entry.last_change = now
+                    if entry.dirty_since is None:
+                        entry.dirty_since = now
+                        self._start_flusher()
+            victims = self._select_victims()
+        for victim in victims:
+            self._close_entry(victim)
+
+    def _select_victims(self) -> List[_PoolEntry]:
+        """Pop least recently used idle entries until the pool fits its budget."""
+        victims = []
+        total = sum(e.size for e in self._entries.values())
+        for key in list(self._entries.keys()):
+            if len(self._entries) <= self.max_docs and total <= self.max_bytes:
+                break
+            entry = self._entries[key]
+            if entry.users > 0:
+                continue
+            del self._entries[key]
+            total -= entry.size
+            victims.append(entry)
+            self._evictions += 1
+        return victims
+
+    def _close_entry(self, entry: _PoolEntry, flush: bool = True):
+        if flush and self.write_behind:
+            with entry.session_lock.write():
+                self._close_editor(entry, flush)
+        else:
+            self._close_editor(entry, flush)
+
+    def _close_editor(self, entry: _PoolEntry, flush: bool):
+        with entry.lock:
+            if entry.editor is not None:
+                if flush:
+                    try:
+                        if not self._flush_entry(entry):
+                            path = self._keep_copy(entry)
+                            where = f"kept in {path}" if path else "could not be kept"
+                            print(f"✗ Closing {entry.pdf_path} with unflushed edits; {where}")
+                    except SessionConflictError:
+                        pass  # Already reported; the handle is gone
+                if entry.editor is None:
+                    return
+                try:
+                    entry.editor.close()
+                except Exception as e:
+                    print(f"✗ Error closing pooled document {entry.pdf_path}: {e}")
+                entry.editor = None
+                entry.session_lock.release_dirty()
+
+    def adopt(self, session_id: str, pdf_path: str, editor: AdvancedPDFEditor):
+        """Adds an editor the caller has already opened, e.g. from in-memory bytes."""
+        with self._lock:
+            entry = _PoolEntry(pdf_path, self._session_lock(session_id, pdf_path))
+        entry.editor = editor
+        editor.write_behind = self.write_behind
+        try:
+            entry.size = os.path.getsize(pdf_path)
+        except OSError:
+            pass
+        with self._lock:
+            previous = self._entries.pop(session_id, None)
+            self._entries[session_id] = entry
+            victims = self._select_victims()
+        if previous is not None:
+            victims.append(previous)
+        for victim in victims:
+            self._close_entry(victim)
+
+    def discard(self, session_id: str):
+        """Close and drop a session's handle, e.g. when its file is deleted; unflushed edits are dropped."""
+        with self._lock:
+            entry = self._entries.pop(session_id, None)
+            self._session_locks.pop(session_id, None)
+        if entry is not None:
+            self._close_entry(entry, flush=False)
+
+    def close_all(self):
+        self._stop.set()
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            self._close_entry(entry)
+
+    # Write-behind
+
+    def flush(self, session_id: str) -> bool:
+        """
+        Writes a session's deferred edits to disk now, e.g. before its file is
+        read directly. Raises SessionConflictError when another process saved
+        the file since those edits were made.
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+        if entry is None:
+            return True
+        with entry.session_lock.write(), entry.lock:
+            return self._flush_entry(entry)
+
+    def _flush_entry(self, entry: _PoolEntry) -> bool:
+        """Caller holds entry.lock and the session's write lock."""
+        if entry.editor is None or not entry.editor.has_unflushed_changes:
+            entry.dirty_since = None
+            entry.session_lock.release_dirty()
+            return True
+        if entry.editor.is_stale():
+            self._set_aside(entry)
+        ok = entry.editor.flush()
+        with self._lock:
+            if ok:
+                entry.dirty_since = None
+                self._flushes += 1
+        if ok:
+            entry.session_lock.release_dirty()
+        else:
+            print(f"✗ Error flushing {entry.pdf_path}")
+        return ok
+
+    def _set_aside(self, entry: _PoolEntry, reason: str = "was saved by another process"):
+        """
+        Handles deferred edits that cannot be written to the session file,
+        usually because another process has since saved it: writing them
+        back would drop that process's edits and move the revision
+        backwards. They are kept in a conflict copy instead, the handle is
+        dropped so the next use reopens the saved file, and
+        SessionConflictError is raised. Caller holds entry.lock.
+        """
+        path = self._keep_copy(entry)
+        try:
+            entry.editor.close()
+        except Exception as e:
+            print(f"✗ Error closing stale document {entry.pdf_path}: {e}")
+        entry.editor = None
+        entry.dirty_since = None
+        entry.session_lock.release_dirty()
+        with self._lock:
+            self._conflicts += 1
+        where = f"kept in {path}" if path else "could not be kept"
+        print(f"✗ Unflushed edits to {entry.pdf_path} set aside ({reason}); {where}")
+        raise SessionConflictError(f"{os.path.basename(entry.pdf_path)} {reason}; unflushed edits {where}")
+
+    def _keep_copy(self, entry: _PoolEntry) -> Optional[str]:
+        """Saves unflushed edits that cannot reach the session file to a conflict copy."""
+        path = conflict_copy_path(entry.pdf_path)
+        return path if entry.editor.save_copy(path) else None
+
+    def _start_flusher(self):
+        """Starts the background flush thread; caller holds self._lock."""
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        self._flusher = threading.Thread(target=self._run_flusher, name="document-flusher", daemon=True)
+        self._flusher.start()
+
+    def _run_flusher(self):
+        interval = max(min(self.flush_delay / 2, 1.0), 0.05)
+        while not self._stop.wait(interval):
+            now = time.time()
+            with self._lock:
+                dirty = [e for e in self._entries.values() if e.dirty_since is not None and e.users == 0]
+            # Flushed early when another process is waiting for the session
+            due = [e for e in dirty
+                   if now - e.last_change >= self.flush_delay
+                   or now - e.dirty_since >= self.flush_max_delay
+                   or e.session_lock.flush_requested()]
+            for entry in due:
+                # Skip documents a request grabbed in the meantime; they are retried next tick
+                with entry.session_lock.try_write() as locked:
+                    if locked:
+                        with entry.lock:
+                            try:
+                                self._flush_entry(entry)
+                            except SessionConflictError:
+                                pass  # Already reported
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "open": len(self._entries),
+                "bytes": sum(e.size for e in self._entries.values()),
+                "maxDocs": self.max_docs,
+                "maxBytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "writeBehind": self.write_behind,
+                "flushes": self._flushes,
+                "reloads": self._reloads,
+                "conflicts": self._conflicts,
+                "peerWaits": self._peer_waits,
+                "dirty": sum(1 for e in self._entries.values() if e.dirty_since is not None),
+            }
+
+
+def create_default_pool(opener: Callable[[str], AdvancedPDFEditor] = AdvancedPDFEditor) -> DocumentPool:
+    """
+    Build a pool sized from PDF_POOL_MAX_DOCS / PDF_POOL_MAX_MB and close it at exit.
+
+    PDF_WRITE_BEHIND=1 defers saves, flushing after PDF_FLUSH_DELAY_MS of
+    idleness or at most PDF_FLUSH_MAX_DELAY_MS after the first edit, or as
+    soon as another process needs the session; that process waits at most
+    PDF_PEER_FLUSH_TIMEOUT_MS.
+    """
+    pool = DocumentPool(
+        max_docs=int(os.getenv('PDF_POOL_MAX_DOCS', 16)),
+        max_bytes=int(os.getenv('PDF_POOL_MAX_MB', 512)) * 1024 * 1024,
+        opener=opener,
+        write_behind=os.getenv('PDF_WRITE_BEHIND', '0') == '1',
+        flush_delay=int(os.getenv('PDF_FLUSH_DELAY_MS', 2000)) / 1000,
+        flush_max_delay=int(os.getenv('PDF_FLUSH_MAX_DELAY_MS', 10000)) / 1000,
+        peer_flush_timeout=int(os.getenv('PDF_PEER_FLUSH_TIMEOUT_MS', 30000)) / 1000,
+    )
+    atexit.register(pool.close_all)
+    return pool
@@ -0,0 +1,463 @@
+"""
+Document Workers Module
+Runs document operations either in this process or on long-lived worker
+processes that each own a shard of sessions, so PyMuPDF work spreads
+across cores instead of contending for one GIL
+"""
+import bisect
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import fitz  # PyMuPDF
+
+from document_pool import DocumentPool, create_default_pool
+from extraction import extract_document
+from pdf_editor import AdvancedPDFEditor
+from render_cache import RenderCache, RenderKey, encode_pixmap
+from session_store import SessionStore
+
+# Virtual nodes per worker on the hash ring; more gives a more even split
+RING_VNODES = 64
+
+# Editor methods the "edit" operation may call
+EDIT_METHODS = ("replace_text", "edit_text_at_rect", "apply_operations")
+
+# Rendered images at least this large come back from workers through shared
+# memory instead of being pickled through the result pipe
+SHARED_IMAGE_MIN_BYTES = int(os.getenv("PDF_SHM_MIN_KB", 64)) * 1024
+SHARED_IMAGE_CHUNK = 256 * 1024
+# Where Linux exposes POSIX shared memory segments as files
+SHM_DIR = "/dev/shm"
+
+
+def document_change_hook(render_cache: RenderCache,
+                         session_store: Optional[SessionStore] = None) -> Callable[[AdvancedPDFEditor, set], None]:
+    """on_change callback for editors: drops stale renders and publishes the new revision."""
+    def on_change(editor, pages):
+        session_id = os.path.basename(editor.pdf_path)
+        render_cache.invalidate(session_id, pages)
+        if session_store is not None:
+            try:
+                session_store.update(session_id, revision=editor.revision)
+            except Exception as e:
+                print(f"✗ Error updating session metadata: {e}")
+    return on_change
+
+
+class OperationContext:
+    """Process-local services available to operations besides the editor."""
+
+    def __init__(self, render_cache: RenderCache):
+        self.render_cache = render_cache
+
+
+# Operations. Each runs with the session's editor checked out of the
+# process's pool; arguments and results must be picklable.
+
+def _describe(ctx: OperationContext, editor: AdvancedPDFEditor) -> Dict:
+    return {"pageCount": len(editor.doc), "revision": editor.revision}
+
+
+def _prepare_session(ctx: OperationContext, editor: AdvancedPDFEditor, cached_pages: Optional[List[Dict]],
+                     lazy: bool, collect_pages: bool) -> Dict:
+    """
+    Everything a new session's first response needs: page sizes when
+    ``lazy``, nothing more when the extraction was cached (the caller
+    already holds it), else the full extraction plus, with
+    ``collect_pages``, per-page results for the content store.
+    """
+    if cached_pages is not None:
+        editor.remember_pages(cached_pages)
+    if lazy:
+        return {"pages": editor.page_sizes()}
+    if cached_pages is not None:
+        return {}
+    result = {"extraction": extract_document(editor)}
+    if collect_pages:
+        result["pageData"] = [editor.extract_page(n) for n in range(1, len(editor.doc) + 1)]
+    return result
+
+
+def _extract_page(ctx: OperationContext, editor: AdvancedPDFEditor, page_num: int,
+                  memoize: bool = True) -> Optional[Dict]:
+    """One page's spans, or None if the page does not exist."""
+    if page_num < 1 or page_num > len(editor.doc):
+        return None
+    return editor.extract_page(page_num, memoize=memoize)
+
+
+def _extract_text(ctx: OperationContext, editor: AdvancedPDFEditor, start: int = 1,
+                  end: Optional[int] = None) -> Dict:
+    return editor.extract_text(start=start, end=end)
+
+
+def _search(ctx: OperationContext, editor: AdvancedPDFEditor, query: str) -> List[Dict]:
+    return editor.search(query)
+
+
+def _edit(ctx: OperationContext, editor: AdvancedPDFEditor, method: str, expected_revision: Optional[int],
+          *args, **kwargs) -> Dict:
+    """Runs an editor mutation unless the document has moved past ``expected_revision``."""
+    if method not in EDIT_METHODS:
+        raise ValueError(f"Unknown edit method: {method}")
+    if expected_revision is not None and expected_revision != editor.revision:
+        return {"conflict": True, "revision": editor.revision}
+    result = getattr(editor, method)(*args, **kwargs)
+    return {"conflict": False, "revision": editor.revision, "result": result}
+
+
+def _compact(ctx: OperationContext, editor: AdvancedPDFEditor) -> bool:
+    return editor.compact()
+
+
+def _render_page(ctx: OperationContext, editor: AdvancedPDFEditor, session_id: str, page_num: int,
+                 dpi: float, fmt: str, tile: Optional[Tuple[int, int, int]] = None,
+                 tile_size: int = 256) -> Tuple[bytes, int, int, int]:
+    """
+    Renders one page through the render cache.
+
+    ``tile`` is an optional (zoom, x, y) triple; the page is then clipped
+    to that ``tile_size`` pixel tile so only the visible part is rasterized.
+
+    Returns (image_bytes, width, height, page_revision). Raises ValueError
+    for an out-of-range page or tile.
+    """
+    doc = editor.doc
+    if page_num < 1 or page_num > len(doc):
+        raise ValueError(f'Invalid page number. PDF has {len(doc)} pages')
+    page = doc[page_num - 1]
+
+    # Render at specified DPI (higher = better quality)
+    mat = fitz.Matrix(dpi / 72, dpi / 72)
+
+    # Clip to the requested tile, in page coordinates
+    clip = None
+    tile_id = ''
+    if tile is not None:
+        zoom, tx, ty = tile
+        step = tile_size * 72 / dpi
+        clip = fitz.Rect(
+            page.rect.x0 + tx * step, page.rect.y0 + ty * step,
+            page.rect.x0 + (tx + 1) * step, page.rect.y0 + (ty + 1) * step
+        ) & page.rect
+        if clip.is_empty:
+            raise ValueError(f'Tile {zoom}/{tx}/{ty} is outside page {page_num}')
+        tile_id = f'{zoom}_{tx}_{ty}'
+
+    # Get dimensions (same integer bounds get_pixmap uses)
+    bounds = ((clip if clip is not None else page.rect) * mat).irect
+
+    # Reuse an earlier render unless this page changed since then
+    revision = editor.page_revision(page_num)
+    key = RenderKey(session_id, revision, page_num, float(dpi), fmt, tile_id)
+    img_bytes = ctx.render_cache.get(key)
+    if img_bytes is None:
+        pix = page.get_pixmap(matrix=mat, clip=clip, alpha=False)
+        img_bytes = encode_pixmap(pix, fmt)
+        ctx.render_cache.put(key, img_bytes)
+    return img_bytes, bounds.width, bounds.height, revision
+
+
+OPERATIONS: Dict[str, Callable] = {
+    "describe": _describe,
+    "prepare_session": _prepare_session,
+    "extract_page": _extract_page,
+    "extract_text": _extract_text,
+    "search": _search,
+    "edit": _edit,
+    "compact": _compact,
+    "render_page": _render_page,
+}
+
+
+def _run(pool: DocumentPool, ctx: OperationContext, session_id: str, pdf_path: str, op: str,
+         args: tuple, kwargs: Dict, write: bool):
+    with pool.acquire(session_id, pdf_path, write=write) as editor:
+        return OPERATIONS[op](ctx, editor, *args, **kwargs)
+
+
+# Shard worker processes. Each keeps its own document pool and render cache
+# memory tier; the disk tier, session files and locks are shared.
+
+_worker_pool: Optional[DocumentPool] = None
+_worker_context: Optional[OperationContext] = None
+
+
+def _init_worker(config: Dict):
+    global _worker_pool, _worker_context
+    render_cache = RenderCache(config["renderCacheDir"],
+                               max_memory_bytes=config["renderCacheMemoryBytes"],
+                               max_disk_bytes=config["renderCacheDiskBytes"])
+    session_store = SessionStore(config["sessionDb"]) if config.get("sessionDb") else None
+    on_change = document_change_hook(render_cache, session_store)
+    _worker_pool = create_default_pool(opener=lambda path: AdvancedPDFEditor(path, on_change=on_change))
+    _worker_context = OperationContext(render_cache)
+
+
+def _worker_run(session_id: str, pdf_path: str, op: str, args: tuple, kwargs: Dict, write: bool):
+    return _run(_worker_pool, _worker_context, session_id, pdf_path, op, args, kwargs, write)
+
+
+def _worker_render(session_id: str, pdf_path: str, args: tuple, kwargs: Dict):
+    img_bytes, width, height, revision = _run(_worker_pool, _worker_context, session_id, pdf_path,
+                                              "render_page", args, kwargs, False)
+    if len(img_bytes) < SHARED_IMAGE_MIN_BYTES:
+        return img_bytes, width, height, revision
+    return SharedImage.create(img_bytes), width, height, revision
+
+
+def _worker_flush(session_id: str) -> bool:
+    return _worker_pool.flush(session_id)
+
+
+def _worker_discard(session_id: str):
+    _worker_pool.discard(session_id)
+
+
+def _worker_stats() -> Dict:
+    return dict(_worker_pool.stats(), pid=os.getpid())
+
+
+def _worker_close():
+    # Worker processes exit without running atexit handlers, so deferred
+    # edits are flushed here on shutdown
+    _worker_pool.close_all()
+
+
+class SharedImage:
+    """Handle to image bytes a worker left in a shared memory segment.
+
+    Only the segment name and size cross the result pipe. The receiving
+    process owns the segment: it reads it through view() or streams it
+    with wsgi_body(), and release() (also run on garbage collection)
+    unlinks it.
+    """
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+        self._owned = False
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._view: Optional[memoryview] = None
+
+    @classmethod
+    def create(cls, data: bytes) -> "SharedImage":
+        """Copies ``data`` into a new segment; called in the worker."""
+        shm = shared_memory.SharedMemory(create=True, size=len(data))
+        try:
+            shm.buf[:len(data)] = data
+        except Exception:
+            shm.close()
+            shm.unlink()
+            raise
+        # The receiver unlinks the segment; keep this process's resource
+        # tracker from removing it when the worker exits
+        resource_tracker.unregister(shm._name, "shared_memory")
+        shm.close()
+        return cls(shm.name, len(data))
+
+    def __getstate__(self):
+        return {"name": self.name, "size": self.size}
+
+    def __setstate__(self, state):
+        self.__init__(state["name"], state["size"])
+        self._owned = True  # The unpickled copy is the receiver's
+
+    def __len__(self) -> int:
+        return self.size
+
+    def view(self) -> memoryview:
+        """Zero-copy view of the image bytes, valid until release()."""
+        if self._view is None:
+            self._shm = shared_memory.SharedMemory(name=self.name)
+            self._view = self._shm.buf[:self.size]
+        return self._view
+
+    def wsgi_body(self, environ: Dict) -> Iterable[bytes]:
+        """
+        Response body streaming the image. On Linux the segment is opened as
+        a file and handed to the server's file wrapper, so gunicorn can
+        sendfile() it straight from shared memory; elsewhere it is copied
+        out in chunks, since WSGI servers only accept bytes.
+        """
+        path = os.path.join(SHM_DIR, self.name)
+        if os.path.isfile(path):
+            from werkzeug.wsgi import wrap_file
+            segment = open(path, "rb")
+            self.release()  # The open file keeps the pages until it is closed
+            return wrap_file(environ, segment, SHARED_IMAGE_CHUNK)
+        return self._chunks()
+
+    def _chunks(self) -> Iterator[bytes]:
+        try:
+            view = self.view()
+            for offset in range(0, self.size, SHARED_IMAGE_CHUNK):
+                yield bytes(view[offset:offset + SHARED_IMAGE_CHUNK])
+        finally:
+            self.release()
+
+    def release(self):
+        """Unmaps and unlinks the segment; safe to call more than once."""
+        if not self._owned:
+            return
+        self._owned = False
+        try:
+            if self._view is not None:
+                self._view.release()
+                self._view = None
+            shm = self._shm or shared_memory.SharedMemory(name=self.name)
+            self._shm = None
+            shm.close()
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"✗ Error releasing shared image {self.name}: {e}")
+
+    def __del__(self):
+        self.release()
+
+
+class HashRing:
+    """Consistent hash ring from session IDs to shard indexes."""
+
+    def __init__(self, shards: int, vnodes: int = RING_VNODES):
+        points = sorted((_ring_hash(f"{shard}:{v}"), shard) for shard in range(shards) for v in range(vnodes))
+        self._keys = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def lookup(self, key: str) -> int:
+        index = bisect.bisect(self._keys, _ring_hash(key)) % len(self._keys)
+        return self._shards[index]
+
+
+def _ring_hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class DocumentRouter:
+    """Runs named document operations for a session.
+
+    With ``workers`` == 0 operations run on this process's pool. Otherwise
+    each session belongs to one of ``workers`` spawned processes, chosen by
+    consistent hashing of the session ID, and every operation on it runs
+    there, so its open document stays warm in one process. Each worker runs
+    one operation at a time. A worker that dies fails its in-flight
+    operations and is restarted on next use.
+
+    Session locks and file staleness checks still apply, so direct file
+    readers in this process and other routers stay consistent.
+    """
+
+    def __init__(self, pool: DocumentPool, context: OperationContext, workers: int = 0,
+                 worker_config: Optional[Dict] = None):
+        self.pool = pool
+        self.context = context
+        self.workers = max(0, workers)
+        self._worker_config = worker_config or {}
+        self._ring = HashRing(self.workers) if self.workers else None
+        self._executors: List[Optional[ProcessPoolExecutor]] = [None] * self.workers
+        self._lock = threading.Lock()
+
+    def call(self, session_id: str, pdf_path: str, op: str, *args, write: bool = False, **kwargs):
+        """
+        Runs ``op`` on the session's document and returns its result;
+        exceptions raised by the operation propagate. Operations that
+        modify the document must pass ``write=True``.
+        """
+        if not self.workers:
+            return _run(self.pool, self.context, session_id, pdf_path, op, args, kwargs, write)
+        return self._submit(self._ring.lookup(session_id), _worker_run,
+                            session_id, pdf_path, op, args, kwargs, write)
+
+    def render(self, session_id: str, pdf_path: str, *args,
+               **kwargs) -> Tuple[Union[bytes, SharedImage], int, int, int]:
+        """
+        The render_page operation. From a worker, images of at least
+        SHARED_IMAGE_MIN_BYTES arrive as a SharedImage instead of bytes;
+        the caller must release() it or stream it with wsgi_body().
+        """
+        if not self.workers:
+            return self.call(session_id, pdf_path, "render_page", *args, **kwargs)
+        return self._submit(self._ring.lookup(session_id), _worker_render, session_id, pdf_path, args, kwargs)
+
+    def _executor(self, shard: int) -> ProcessPoolExecutor:
+        with self._lock:
+            executor = self._executors[shard]
+            if executor is None:
+                executor = self._executors[shard] = ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self._worker_config,),
+                )
+            return executor
+
+    def _submit(self, shard: int, fn: Callable, *args):
+        executor = self._executor(shard)
+        try:
+            return executor.submit(fn, *args).result()
+        except BrokenProcessPool:
+            with self._lock:
+                if self._executors[shard] is executor:
+                    self._executors[shard] = None
+            raise RuntimeError(f"Document worker {shard} exited unexpectedly")
+
+    # Pool-level operations, routed like call()
+
+    def flush(self, session_id: str) -> bool:
+        """Writes a session's deferred edits to disk now."""
+        if not self.workers:
+            return self.pool.flush(session_id)
+        return self._submit(self._ring.lookup(session_id), _worker_flush, session_id)
+
+    def discard(self, session_id: str):
+        """Closes a session's document wherever it is open; unflushed edits are dropped."""
+        self.pool.discard(session_id)
+        if self.workers:
+            self._submit(self._ring.lookup(session_id), _worker_discard, session_id)
+
+    def adopt(self, session_id: str, pdf_path: str, editor: AdvancedPDFEditor):
+        """Pools an editor opened by the caller; with workers it is closed and the owner reopens the file."""
+        if not self.workers:
+            self.pool.adopt(session_id, pdf_path, editor)
+        else:
+            editor.close()
+
+    @contextmanager
+    def reading(self, session_id: str, pdf_path: str) -> Iterator[None]:
+        """Shared session lock for code that reads the session file directly."""
+        with self.pool.reading(session_id, pdf_path):
+            yield
+
+    def stats(self) -> Dict:
+        if not self.workers:
+            return self.pool.stats()
+        with self._lock:
+            started = [shard for shard, executor in enumerate(self._executors) if executor is not None]
+        shards = []
+        for shard in started:
+            try:
+                shards.append(dict(self._submit(shard, _worker_stats), shard=shard))
+            except Exception as e:
+                shards.append({"shard": shard, "error": str(e)})
+        return {"workers": self.workers, "shards": shards}
+
+    def close(self):
+        with self._lock:
+            executors, self._executors = self._executors, [None] * self.workers
+        for executor in executors:
+            if executor is None:
+                continue
+            try:
+                executor.submit(_worker_close).result(timeout=30)
+            except Exception as e:
+                print(f"✗ Error closing document worker: {e}")
+            executor.shutdown(wait=True)
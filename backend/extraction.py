@@ -0,0 +1,101 @@
+"""
+Extraction Module
+Splits text extraction for large documents across a process pool
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+from pdf_editor import AdvancedPDFEditor, extract_page_data, merge_page_extractions
+
+# Documents shorter than this are extracted serially; below it the cost of
+# shipping results between processes outweighs the parallel speedup
+PARALLEL_MIN_PAGES = int(os.getenv('EXTRACT_PARALLEL_MIN_PAGES', 150))
+EXTRACT_WORKERS = int(os.getenv('EXTRACT_WORKERS', os.cpu_count() or 1))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Lazily starts the shared worker pool (spawned, so workers never inherit open documents)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _extract_chunk(pdf_path: str, start: int, end: int) -> List[Dict]:
+    """
+    Worker entry point: extracts pages start..end (1-based) from its own
+    read-only handle. Only the PDF is opened, never the revision sidecar,
+    which belongs to the process holding the session lock.
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        return [extract_page_data(doc[n - 1], n)[0] for n in range(start, end + 1)]
+    finally:
+        doc.close()
+
+
+def split_pages(page_count: int, chunks: int) -> List[Tuple[int, int]]:
+    """Splits 1..page_count into at most ``chunks`` contiguous, near-equal ranges."""
+    chunks = max(1, min(chunks, page_count))
+    size, extra = divmod(page_count, chunks)
+    ranges = []
+    start = 1
+    for i in range(chunks):
+        end = start + size - 1 + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end + 1
+    return ranges
+
+
+def extract_pages_parallel(pdf_path: str, page_count: int, workers: Optional[int] = None) -> List[Dict]:
+    """
+    Extracts every page of the file on disk using the process pool.
+
+    Each worker gets a few contiguous chunks (more chunks than workers keeps
+    the pool busy when some pages are much heavier than others); results come
+    back in page order.
+    """
+    workers = workers or EXTRACT_WORKERS
+    executor = _get_executor()
+    futures = [
+        executor.submit(_extract_chunk, pdf_path, start, end)
+        for start, end in split_pages(page_count, workers * 4)
+    ]
+    pages: List[Dict] = []
+    for future in futures:
+        pages.extend(future.result())
+    return pages
+
+
+def extract_document(editor: AdvancedPDFEditor, workers: Optional[int] = None) -> Dict:
+    """
+    Full-document extraction for an open editor, in parallel when worthwhile.
+
+    Falls back to the editor's serial extract_text() for small documents,
+    single-worker setups, or when the in-memory document has changes that
+    are not on disk yet (workers read the file). Parallel results also seed
+    the editor's per-page memo.
+    """
+    workers = workers or EXTRACT_WORKERS
+    page_count = len(editor.doc)
+    if page_count < PARALLEL_MIN_PAGES or workers <= 1 or editor.doc.is_dirty:
+        return editor.extract_text()
+    try:
+        pages = extract_pages_parallel(editor.pdf_path, page_count, workers)
+    except Exception as e:
+        print(f"✗ Parallel extraction failed, falling back to serial: {e}")
+        return editor.extract_text()
+    editor.remember_pages(pages)
+    return merge_page_extractions(pages)
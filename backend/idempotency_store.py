@@ -0,0 +1,167 @@
+"""
+Idempotency Store Module
+Responses of mutating requests recorded by Idempotency-Key in SQLite, so a
+retried request is answered from the record instead of being applied twice
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# Outcomes of claim()
+CLAIMED = "claimed"          # The caller runs the request and must complete() or release() it
+REPLAY = "replay"            # A response is recorded for this key; send it again
+IN_PROGRESS = "in_progress"  # Another request with this key is still running
+MISMATCH = "mismatch"        # The key was used for a different request
+
+PENDING = "pending"
+DONE = "done"
+
+# Expired and surplus records are purged at most once per interval
+PURGE_INTERVAL = 60
+
+
+class IdempotencyStore:
+    """Bounded TTL record of key -> (status, body, revision) in one WAL-mode database.
+
+    A request claims its key before doing any work. The claim is a pending
+    row; once the response is known it is recorded and kept for
+    ``ttl_seconds``. A claim whose request died without completing expires
+    after ``pending_timeout`` seconds, so the key can be retried. Each key
+    remembers a fingerprint of the request it was first used with, and
+    reusing it for a different request is refused. Beyond ``max_entries``
+    the oldest recorded responses are dropped first.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float = 24 * 3600, max_entries: int = 10000,
+                 pending_timeout: float = 300):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.pending_timeout = pending_timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self._replayed = 0
+        self._mismatched = 0
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS idempotency (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                state TEXT NOT NULL,
+                owner INTEGER,
+                status INTEGER,
+                mimetype TEXT,
+                body BLOB,
+                revision INTEGER,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idempotency_expires ON idempotency (expires_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def claim(self, key: str, fingerprint: str) -> Tuple[str, Optional[Dict]]:
+        """
+        Claims ``key`` for the request identified by ``fingerprint``.
+
+        Returns (CLAIMED, None), (REPLAY, record), (IN_PROGRESS, None) or
+        (MISMATCH, None).
+        """
+        self._maybe_purge()
+        conn = self._connect()
+        while True:
+            now = time.time()
+            cursor = conn.execute(
+                "INSERT INTO idempotency (key, fingerprint, state, owner, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET fingerprint = excluded.fingerprint, state = excluded.state, "
+                "owner = excluded.owner, status = NULL, mimetype = NULL, body = NULL, revision = NULL, "
+                "created_at = excluded.created_at, expires_at = excluded.expires_at "
+                "WHERE idempotency.expires_at < ?",
+                (key, fingerprint, PENDING, os.getpid(), now, now + self.pending_timeout, now),
+            )
+            if cursor.rowcount == 1:
+                return CLAIMED, None
+            row = conn.execute("SELECT * FROM idempotency WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                continue  # Released between the two statements; claim again
+            if row["fingerprint"] != fingerprint:
+                with self._lock:
+                    self._mismatched += 1
+                return MISMATCH, None
+            if row["state"] == PENDING:
+                return IN_PROGRESS, None
+            with self._lock:
+                self._replayed += 1
+            return REPLAY, _record_dict(row)
+
+    def wait(self, key: str, fingerprint: str, timeout: float,
+             poll_interval: float = 0.05) -> Tuple[str, Optional[Dict]]:
+        """claim(), waiting up to ``timeout`` seconds for a request in progress to finish."""
+        deadline = time.monotonic() + timeout
+        while True:
+            outcome, record = self.claim(key, fingerprint)
+            if outcome != IN_PROGRESS or time.monotonic() >= deadline:
+                return outcome, record
+            time.sleep(poll_interval)
+
+    def complete(self, key: str, status: int, body: bytes, mimetype: Optional[str],
+                 revision: Optional[int] = None):
+        """Records the response of a claimed request."""
+        now = time.time()
+        self._connect().execute(
+            "UPDATE idempotency SET state = ?, status = ?, mimetype = ?, body = ?, revision = ?, "
+            "expires_at = ? WHERE key = ? AND owner = ? AND state = ?",
+            (DONE, status, mimetype, body, revision, now + self.ttl_seconds, key, os.getpid(), PENDING),
+        )
+
+    def release(self, key: str):
+        """Drops a claim without recording a response, so the request may be retried."""
+        self._connect().execute("DELETE FROM idempotency WHERE key = ? AND owner = ? AND state = ?",
+                                (key, os.getpid(), PENDING))
+
+    def stats(self) -> Dict:
+        row = self._connect().execute(
+            "SELECT COUNT(*) AS n, COALESCE(SUM(state = ?), 0) AS pending FROM idempotency", (PENDING,)).fetchone()
+        with self._lock:
+            return {"entries": row["n"], "pending": row["pending"],
+                    "replayed": self._replayed, "mismatched": self._mismatched}
+
+    def _maybe_purge(self):
+        now = time.time()
+        with self._lock:
+            if now - self._last_purge < PURGE_INTERVAL:
+                return
+            self._last_purge = now
+        conn = self._connect()
+        conn.execute("DELETE FROM idempotency WHERE expires_at < ?", (now,))
+        surplus = conn.execute("SELECT COUNT(*) FROM idempotency").fetchone()[0] - self.max_entries
+        if surplus > 0:
+            conn.execute(
+                "DELETE FROM idempotency WHERE key IN "
+                "(SELECT key FROM idempotency WHERE state = ? ORDER BY created_at LIMIT ?)",
+                (DONE, surplus),
+            )
+
+
+def _record_dict(row: sqlite3.Row) -> Dict:
+    return {
+        "status": row["status"],
+        "mimetype": row["mimetype"],
+        "body": row["body"],
+        "revision": row["revision"],
+    }
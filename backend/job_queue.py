@@ -0,0 +1,247 @@
+"""
+Job Queue Module
+Runs slow conversions in background threads with their state persisted to
+SQLite, so requests return immediately and clients poll for the result
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from process_identity import process_running, process_start_time
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+# Finished jobs are purged after this long, checked at most once per interval
+JOB_RETENTION_SECONDS = 24 * 3600
+PURGE_INTERVAL = 3600
+
+
+class JobCancelled(Exception):
+    """Raised by a handler that notices its job was cancelled."""
+
+
+class JobContext:
+    """What a running handler can see of its job."""
+
+    def __init__(self, job_id: str, params: Dict, cancel_event: threading.Event):
+        self.job_id = job_id
+        self.params = params
+        self._cancel_event = cancel_event
+
+    def is_cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+
+class JobQueue:
+    """Bounded background executor for named job types.
+
+    Each job type has its own thread pool, so a burst of one kind of
+    conversion cannot starve the others. A handler receives a JobContext and
+    returns a JSON-serializable result; raising marks the job failed.
+
+    Jobs are claimed atomically in SQLite, so several worker processes can
+    share one database. On start, jobs left running by a process that no
+    longer exists are re-queued, and every queued job is picked up again.
+    Cancelling a queued job removes it; cancelling a running job is
+    cooperative - the handler may stop early via check_cancelled(), and its
+    result is discarded either way.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.limits: Dict[str, int] = {}
+        self._handlers: Dict[str, Callable[[JobContext], Dict]] = {}
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._last_purge = 0.0
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    type TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    pid INTEGER,
+                    pid_started TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "pid_started" not in columns:  # Databases created before it was tracked
+                conn.execute("ALTER TABLE jobs ADD COLUMN pid_started TEXT")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    # Registration and startup
+
+    def register(self, job_type: str, handler: Callable[[JobContext], Dict], concurrency: int = 1):
+        """Adds a job type that runs at most ``concurrency`` jobs at once in this process."""
+        workers = max(1, concurrency)
+        self.limits[job_type] = workers
+        self._handlers[job_type] = handler
+        self._executors[job_type] = ThreadPoolExecutor(max_workers=workers,
+                                                      thread_name_prefix=f"job-{job_type}")
+
+    def start(self):
+        """Re-queues jobs orphaned by dead processes and schedules everything queued."""
+        conn = self._connect()
+        for row in conn.execute("SELECT id, pid, pid_started FROM jobs WHERE status = ?", (RUNNING,)).fetchall():
+            if not _pid_alive(row["pid"], row["pid_started"]):
+                conn.execute("UPDATE jobs SET status = ?, pid = NULL, pid_started = NULL, started_at = NULL "
+                             "WHERE id = ? AND status = ?", (QUEUED, row["id"], RUNNING))
+        for row in conn.execute("SELECT id, type FROM jobs WHERE status = ? ORDER BY created_at",
+                                (QUEUED,)).fetchall():
+            self._schedule(row["id"], row["type"])
+
+    def shutdown(self):
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    # Public API
+
+    def submit(self, job_type: str, params: Dict) -> str:
+        if job_type not in self._handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        job_id = str(uuid.uuid4())
+        self._connect().execute(
+            "INSERT INTO jobs (id, type, status, params, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, job_type, QUEUED, json.dumps(params), time.time()),
+        )
+        self._schedule(job_id, job_type)
+        self._maybe_purge()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "type": row["type"],
+            "status": row["status"],
+            "params": json.loads(row["params"]),
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "cancelRequested": bool(row["cancel_requested"]),
+            "createdAt": row["created_at"],
+            "startedAt": row["started_at"],
+            "finishedAt": row["finished_at"],
+        }
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """Cancels a job; returns its updated state, or None if it does not exist."""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("UPDATE jobs SET status = ?, cancel_requested = 1, finished_at = ? "
+                     "WHERE id = ? AND status = ?", (CANCELLED, now, job_id, QUEUED))
+        conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?",
+                     (job_id, RUNNING))
+        with self._lock:
+            event = self._cancel_events.get(job_id)
+        if event is not None:
+            event.set()
+        return self.get(job_id)
+
+    def stats(self) -> Dict:
+        counts = {row["status"]: row["n"] for row in self._connect().execute(
+            "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+        return {"counts": counts, "limits": dict(self.limits)}
+
+    # Execution
+
+    def _schedule(self, job_id: str, job_type: str):
+        executor = self._executors.get(job_type)
+        if executor is None:
+            return  # Type not registered in this process
+        executor.submit(self._run, job_id, job_type)
+
+    def _claim(self, job_id: str) -> bool:
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = ?, pid = ?, pid_started = ?, started_at = ? WHERE id = ? AND status = ?",
+            (RUNNING, os.getpid(), process_start_time(os.getpid()), time.time(), job_id, QUEUED),
+        )
+        return cursor.rowcount == 1
+
+    def _run(self, job_id: str, job_type: str):
+        if not self._claim(job_id):
+            return  # Cancelled, or picked up by another process
+        job = self.get(job_id)
+        event = threading.Event()
+        if job["cancelRequested"]:
+            event.set()
+        with self._lock:
+            self._cancel_events[job_id] = event
+
+        status, result, error = SUCCEEDED, None, None
+        try:
+            result = self._handlers[job_type](JobContext(job_id, job["params"], event))
+        except JobCancelled:
+            status = CANCELLED
+        except Exception as e:
+            print(f"✗ Job {job_id} ({job_type}) failed: {e}")
+            status, error = FAILED, str(e)
+        finally:
+            with self._lock:
+                self._cancel_events.pop(job_id, None)
+
+        conn = self._connect()
+        cancelled = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?",
+                                 (job_id,)).fetchone()
+        if cancelled is not None and cancelled["cancel_requested"]:
+            status, result = CANCELLED, None
+        conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+            (status, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+        )
+
+    def _maybe_purge(self):
+        now = time.time()
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        placeholders = ",".join("?" for _ in FINISHED_STATES)
+        self._connect().execute(
+            f"DELETE FROM jobs WHERE status IN ({placeholders}) AND finished_at < ?",
+            (*FINISHED_STATES, now - JOB_RETENTION_SECONDS),
+        )
+
+
+def _pid_alive(pid: Optional[int], started: Optional[str] = None) -> bool:
+    """
+    True while the process that claimed a job may still be running: its PID
+    exists and, when ``started`` was recorded, it is the same run of it.
+    """
+    if pid == os.getpid():
+        return False  # Nothing of ours is running yet at startup
+    return process_running(pid, started)
@@ -0,0 +1,203 @@
+"""
+Office Pool Module
+Long-running headless LibreOffice processes that convert Word documents to
+PDF over UNO, so conversions skip LibreOffice startup
+"""
+import atexit
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from typing import List, Optional
+
+try:
+    import uno  # Ships with LibreOffice (python3-uno), not on PyPI
+    from com.sun.star.beans import PropertyValue
+    HAS_UNO = True
+except ImportError:
+    HAS_UNO = False
+
+OFFICE_POOL_SIZE = int(os.getenv('OFFICE_POOL_SIZE', 2))
+# Conversions per process before it is recycled; soffice leaks memory over time
+OFFICE_MAX_CONVERSIONS = int(os.getenv('OFFICE_MAX_CONVERSIONS', 200))
+OFFICE_CONVERT_TIMEOUT = int(os.getenv('OFFICE_CONVERT_TIMEOUT', 120))
+OFFICE_STARTUP_TIMEOUT = 30
+OFFICE_HEALTH_TIMEOUT = 10
+
+
+def find_soffice() -> Optional[str]:
+    return shutil.which('soffice') or shutil.which('libreoffice')
+
+
+def _property(name: str, value) -> "PropertyValue":
+    prop = PropertyValue()
+    prop.Name = name
+    prop.Value = value
+    return prop
+
+
+class _OfficeProcess:
+    """One soffice listener with its own user profile, reached over a named pipe."""
+
+    def __init__(self, binary: str, slot: int):
+        self.binary = binary
+        self.pipe_name = f"pdfsim_{os.getpid()}_{slot}"
+        self.profile_dir = tempfile.mkdtemp(prefix=f"pdfsim-office-{slot}-")
+        self.proc: Optional[subprocess.Popen] = None
+        self.desktop = None
+        self.conversions = 0
+
+    def start(self):
+        self.stop()
+        self.proc = subprocess.Popen([
+            self.binary,
+            '--headless', '--invisible', '--nologo', '--norestore', '--nodefault', '--nolockcheck',
+            f'-env:UserInstallation={uno.systemPathToFileUrl(self.profile_dir)}',
+            f'--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext',
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.conversions = 0
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_context)
+        deadline = time.time() + OFFICE_STARTUP_TIMEOUT
+        while True:
+            try:
+                context = resolver.resolve(
+                    f"uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext")
+                self.desktop = context.ServiceManager.createInstanceWithContext(
+                    "com.sun.star.frame.Desktop", context)
+                return
+            except Exception:
+                if self.proc.poll() is not None or time.time() > deadline:
+                    self.stop()
+                    raise RuntimeError("LibreOffice listener did not start")
+                time.sleep(0.25)
+
+    def is_healthy(self) -> bool:
+        if self.proc is None or self.proc.poll() is not None or self.desktop is None:
+            return False
+        # A hung process would block the round trip forever, so bound it
+        watchdog = threading.Timer(OFFICE_HEALTH_TIMEOUT, self.kill)
+        watchdog.start()
+        try:
+            self.desktop.getComponents()  # Round trip over the bridge
+            return True
+        except Exception:
+            return False
+        finally:
+            watchdog.cancel()
+
+    def convert(self, docx_path: str, pdf_path: str, timeout: float):
+        """Converts one document; kills the process if it takes longer than ``timeout``."""
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            self.kill()
+
+        watchdog = threading.Timer(timeout, kill)
+        watchdog.start()
+        document = None
+        try:
+            document = self.desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(os.path.abspath(docx_path)), "_blank", 0,
+                (_property("Hidden", True), _property("ReadOnly", True)))
+            document.storeToURL(
+                uno.systemPathToFileUrl(os.path.abspath(pdf_path)),
+                (_property("FilterName", "writer_pdf_Export"),))
+        except Exception:
+            if timed_out.is_set():
+                raise TimeoutError(f"Conversion exceeded {timeout}s")
+            raise
+        finally:
+            watchdog.cancel()
+            if document is not None:
+                try:
+                    document.close(True)
+                except Exception:
+                    pass
+        self.conversions += 1
+
+    def kill(self):
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.kill()
+
+    def stop(self):
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+            self.desktop = None
+        if self.proc is not None:
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+            self.proc = None
+
+    def close(self):
+        self.stop()
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+class OfficePool:
+    """Fixed set of soffice listeners shared by all conversion threads.
+
+    Processes start lazily on first use. Before each conversion the process
+    is health-checked over the bridge and restarted if it died or hung; a
+    conversion that exceeds its timeout kills the process, which is
+    restarted for the next caller. Processes are also recycled after
+    OFFICE_MAX_CONVERSIONS conversions.
+    """
+
+    def __init__(self, size: int = OFFICE_POOL_SIZE, max_conversions: int = OFFICE_MAX_CONVERSIONS):
+        self.size = size
+        self.max_conversions = max_conversions
+        self._binary = find_soffice()
+        self._processes: List[_OfficeProcess] = []
+        self._idle: "queue.Queue[_OfficeProcess]" = queue.Queue()
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        return HAS_UNO and self._binary is not None
+
+    def _ensure_processes(self):
+        with self._lock:
+            if self._processes:
+                return
+            for slot in range(self.size):
+                process = _OfficeProcess(self._binary, slot)
+                self._processes.append(process)
+                self._idle.put(process)
+
+    def convert(self, docx_path: str, pdf_path: str, timeout: float = OFFICE_CONVERT_TIMEOUT):
+        """Converts ``docx_path`` to ``pdf_path``; raises on failure or timeout."""
+        if not self.available():
+            raise RuntimeError("LibreOffice UNO bridge is not available")
+        self._ensure_processes()
+        process = self._idle.get()
+        try:
+            if process.conversions >= self.max_conversions or not process.is_healthy():
+                process.start()
+            try:
+                process.convert(docx_path, pdf_path, timeout)
+            except Exception:
+                process.stop()  # Restarted by the next caller
+                raise
+        finally:
+            self._idle.put(process)
+
+    def close(self):
+        with self._lock:
+            processes, self._processes = self._processes, []
+        for process in processes:
+            process.close()
+
+
+office_pool = OfficePool()
+atexit.register(office_pool.close)
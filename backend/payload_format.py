@@ -0,0 +1,120 @@
+"""
+Payload Format Module
+Compact columnar encoding of extraction results, negotiated via Accept
+"""
+from typing import Dict, List, Tuple
+
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    msgpack = None
+    HAS_MSGPACK = False
+
+JSON_MIMETYPE = "application/json"
+COLUMNAR_JSON_MIMETYPE = "application/vnd.pdfsim.columnar+json"
+COLUMNAR_MSGPACK_MIMETYPE = "application/vnd.pdfsim.columnar+msgpack"
+NDJSON_MIMETYPE = "application/x-ndjson"
+COLUMNAR_FORMAT = "pdfsim.columnar.v1"
+
+# Coordinates are rounded to 1/1000 pt (well below anything visible) so the
+# flat float arrays stay short once serialized
+COORD_DIGITS = 3
+
+
+def supported_mimetypes() -> List[str]:
+    """Mimetypes the extraction endpoints can produce; plain JSON first so */* keeps the old format."""
+    mimetypes = [JSON_MIMETYPE, COLUMNAR_JSON_MIMETYPE]
+    if HAS_MSGPACK:
+        mimetypes.append(COLUMNAR_MSGPACK_MIMETYPE)
+    return mimetypes
+
+
+def _columnar_page(page: Dict, font_table: List[List], font_index: Dict[Tuple, int]) -> Dict:
+    blocks = page.get("blocks", [])
+    columns = {
+        "page": page["page"],
+        "width": page["width"],
+        "height": page["height"],
+        "count": len(blocks),
+        "text": [],
+        "font": [],
+        "size": [],
+        "color": [],
+        "flags": [],
+        "bbox": [],
+        "origin": [],
+    }
+    for span in blocks:
+        key = (span["font"], span.get("font_id"))
+        index = font_index.get(key)
+        if index is None:
+            index = font_index[key] = len(font_table)
+            font_table.append([span["font"], span.get("font_id")])
+        columns["text"].append(span["text"])
+        columns["font"].append(index)
+        columns["size"].append(round(span["size"], COORD_DIGITS))
+        columns["color"].append(span["color"])
+        columns["flags"].append(span.get("flags", 0))
+        columns["bbox"].extend(round(v, COORD_DIGITS) for v in span["bbox"])
+        columns["origin"].extend(round(v, COORD_DIGITS) for v in span["origin"])
+    return columns
+
+
+def to_columnar(payload: Dict) -> Dict:
+    """
+    Converts an extraction payload ({"pages": [...], ...}) to the columnar layout.
+
+    Each page becomes parallel arrays (text, font, size, color, flags) plus
+    flat bbox (4 per span) and origin (2 per span) arrays. Font names are
+    interned once per payload in "fontTable" as [name, font_id] pairs; the
+    per-span "font" column indexes into it and is_subset is implied by a "+"
+    in the name. Other top-level keys are passed through unchanged.
+    """
+    font_table: List[List] = []
+    font_index: Dict[Tuple, int] = {}
+    result = {k: v for k, v in payload.items() if k != "pages"}
+    result["format"] = COLUMNAR_FORMAT
+    result["pages"] = [_columnar_page(p, font_table, font_index) for p in payload.get("pages", [])]
+    result["fontTable"] = font_table
+    return result
+
+
+def from_columnar(payload: Dict) -> Dict:
+    """Expands a columnar payload back into the default one-dict-per-span layout."""
+    font_table = payload["fontTable"]
+    result = {k: v for k, v in payload.items() if k not in ("pages", "fontTable", "format")}
+    result["pages"] = []
+    for columns in payload["pages"]:
+        blocks = []
+        bbox, origin = columns["bbox"], columns["origin"]
+        for i in range(columns["count"]):
+            font_name, font_id = font_table[columns["font"][i]]
+            blocks.append({
+                "text": columns["text"][i],
+                "bbox": bbox[4 * i:4 * i + 4],
+                "font": font_name,
+                "font_id": font_id,
+                "size": columns["size"][i],
+                "color": columns["color"][i],
+                "origin": origin[2 * i:2 * i + 2],
+                "is_subset": "+" in font_name,
+                "flags": columns["flags"][i],
+            })
+        result["pages"].append({
+            "page": columns["page"],
+            "width": columns["width"],
+            "height": columns["height"],
+            "blocks": blocks,
+        })
+    return result
+
+
+def pack_msgpack(payload: Dict) -> bytes:
+    """Columnar payload as MessagePack bytes (requires the optional msgpack package)."""
+    # MuPDF computes coordinates in single precision, so float32 loses nothing
+    return msgpack.packb(to_columnar(payload), use_bin_type=True, use_single_float=True)
+
+
+def unpack_msgpack(data: bytes) -> Dict:
+    return from_columnar(msgpack.unpackb(data, raw=False))
@@ -1,15 +1,309 @@
 import fitz  # PyMuPDF
 import os
-from typing import Dict, List, Optional, Any
+import json
+import math
+from typing import Callable, Dict, List, Optional, Any, Set, Tuple
 import datetime
 import tempfile
 import time
 import traceback
+from content_store import ContentStore
+from process_identity import current_process, process_running
+from session_lock import dirty_claim_held
+from text_index import TextIndex
+
+def revision_path(pdf_path: str) -> str:
+    """Sidecar file holding the document and per-page revision counters."""
+    return pdf_path + ".rev.json"
+
+def read_revisions(pdf_path: str) -> Dict:
+    """Loads revision info for a PDF without opening it.
+
+    Returns {"revision": int, "pages": {page_number: revision}, "dirty": bool,
+    "owner": {"pid": int, "started": str} or None}, where a page's revision
+    is the document revision at which it last changed, "dirty" means
+    revisions were handed out for edits that had not been flushed to the
+    PDF yet, and "owner" is the process holding those edits.
+    """
+    try:
+        with open(revision_path(pdf_path), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return {
+            "revision": int(data.get("revision", 0)),
+            "pages": {int(k): int(v) for k, v in data.get("pages", {}).items()},
+            "dirty": bool(data.get("dirty", False)),
+            "owner": data.get("owner") if isinstance(data.get("owner"), dict) else None
+        }
+    except (OSError, ValueError):
+        return {"revision": 0, "pages": {}, "dirty": False, "owner": None}
+
+def _owner_alive(pdf_path: str, owner: Optional[Dict]) -> bool:
+    """Whether the process that marked a session dirty still holds its edits."""
+    if not owner:
+        return False
+    held = dirty_claim_held(pdf_path)
+    if held is not None:
+        return held
+    try:
+        return process_running(int(owner.get("pid", 0)), owner.get("started"))
+    except (TypeError, ValueError):
+        return False
+
+def _fsync_path(path: str):
+    """Forces a file's contents to stable storage."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _disk_state(path: str) -> Optional[tuple]:
+    """Identity of the file version at ``path``: replaced files get a new inode, appends a new size."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+def merge_page_extractions(pages: List[Dict]) -> Dict:
+    """Combines extract_page() results into the extract_text() layout.
+
+    Pages keep their order; the document font map keeps the first entry seen
+    for each font name.
+    """
+    result = {"pages": [], "fonts": {}}
+    for page_data in pages:
+        page_data = dict(page_data)
+        for font_name, info in page_data.pop("fonts", {}).items():
+            result["fonts"].setdefault(font_name, info)
+        result["pages"].append(page_data)
+    return result
+
+def extract_page_data(page: fitz.Page, page_num: int) -> Tuple[Dict, List[List[str]]]:
+    """
+    Extracts one page's text spans with font metadata, in the layout of
+    AdvancedPDFEditor.extract_page(), plus the span texts of each line for
+    the text index. Needs only an open page, so worker processes use it on
+    plain read-only documents.
+    """
+    page_data = {
+        "page": page_num,
+        "width": page.rect.width,
+        "height": page.rect.height,
+        "blocks": [],
+        "fonts": {}
+    }
+    page_fonts = page.get_fonts()
+    font_map = {f[3]: {"id": f[0], "ext": f[1], "type": f[2]} for f in page_fonts}
+
+    lines = []
+    blocks = page.get_text("dict")["blocks"]
+    for block in blocks:
+        if block["type"] == 0:
+            for line in block["lines"]:
+                lines.append([span["text"] for span in line["spans"]])
+                for span in line["spans"]:
+                    font_name = span["font"]
+                    font_info = font_map.get(font_name, {})
+                    page_data["blocks"].append({
+                        "text": span["text"],
+                        "bbox": span["bbox"],
+                        "font": font_name,
+                        "font_id": font_info.get("id"),
+                        "size": span["size"],
+                        "color": span["color"],
+                        "origin": span["origin"],
+                        "is_subset": "+" in font_name,
+                        "flags": span.get("flags", 0)
+                    })
+                    if font_name not in page_data["fonts"] and font_info.get("id"):
+                        page_data["fonts"][font_name] = {
+                            "object_id": font_info["id"],
+                            "type": font_info["type"]
+                        }
+    return page_data, lines
+
+def _span_lines(spans: List[Dict]) -> List[List[str]]:
+    """
+    Regroups flat extracted spans into lines: a span continues the previous
+    one's line when it sits on the same baseline and starts where that one
+    ends.
+    """
+    lines: List[List[str]] = []
+    previous = None
+    for span in spans:
+        if (previous is not None
+                and abs(span["origin"][1] - previous["origin"][1]) < 0.5
+                and -1 <= span["bbox"][0] - previous["bbox"][2] <= max(previous["size"], 1) * 0.5):
+            lines[-1].append(span["text"])
+        else:
+            lines.append([span["text"]])
+        previous = span
+    return lines
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+def _is_point(value: Any, size: int = 2) -> bool:
+    return isinstance(value, (list, tuple)) and len(value) == size and all(_is_number(v) for v in value)
+
+def _batch_op_error(op: Dict, page_count: int) -> Optional[str]:
+    """Why an apply_operations() entry cannot be applied, or None when it is well formed."""
+    if not isinstance(op, dict):
+        return "operation must be an object"
+    op_type = op.get("type")
+    if op_type == "replace":
+        old_text = op.get("old_text")
+        return None if isinstance(old_text, str) and old_text else "replace needs old_text"
+    if op_type not in ("rect", "delete", "add"):
+        return f"unknown type {op_type!r}"
+    page_num = op.get("page_num")
+    if not isinstance(page_num, int) or isinstance(page_num, bool) or not 0 < page_num <= page_count:
+        return f"page {page_num!r} out of range"
+    if op_type in ("rect", "delete") and not _is_point(op.get("rect"), 4):
+        return "rect needs 4 numbers"
+    if op_type == "rect" and op.get("origin") is not None and not _is_point(op["origin"]):
+        return "origin needs 2 numbers"
+    if op_type == "add" and not (_is_number(op.get("x", 0)) and _is_number(op.get("y", 0))):
+        return "x and y must be numbers"
+    if op_type in ("rect", "add"):
+        text = op.get("new_text" if op_type == "rect" else "text")
+        if text is not None and not isinstance(text, str):
+            return "text must be a string"
+        font_size = op.get("font_size", 11)
+        if not _is_number(font_size) or font_size <= 0:
+            return "font_size must be a positive number"
+    return None
 
 class AdvancedPDFEditor:
-    def __init__(self, pdf_path: str):
+    # Incremental updates appended to a file before a full compacting rewrite
+    MAX_INCREMENTAL_SAVES = int(os.getenv('PDF_MAX_INCREMENTAL_SAVES', 25))
+
+    def __init__(self, pdf_path: str, incremental: bool = True,
+                 on_change: Optional[Callable[["AdvancedPDFEditor", Set[int]], None]] = None,
+                 stream: Optional[bytes] = None, write_behind: bool = False):
+        """
+        Opens ``pdf_path``, or parses ``stream`` directly when the caller
+        already holds the bytes it has just written to ``pdf_path``.
+
+        With ``write_behind`` edits to the session file stay in memory until
+        flush() (or compact()) is called; the owner decides when.
+        """
         self.pdf_path = pdf_path
-        self.doc = fitz.open(pdf_path)
+        self.incremental = incremental
+        self.on_change = on_change
+        self.write_behind = write_behind
+        self._unflushed = False
+        self._in_operation = False
+        self._journal_step = 0
+        if stream is not None:
+            self.doc = fitz.open(stream=stream, filetype="pdf")
+        else:
+            self.doc = fitz.open(pdf_path)
+        self._track_versions()
+        revisions = read_revisions(pdf_path)
+        self.revision = revisions["revision"]
+        self.page_revisions = revisions["pages"]
+        self._touched_pages: Set[int] = set()
+        self._page_cache: Dict[int, Dict] = {}
+        self.text_index = TextIndex()
+        if revisions["dirty"] and not _owner_alive(pdf_path, revisions["owner"]):
+            self._recover_lost_revisions()
+
+    def page_revision(self, page_num: int) -> int:
+        """Document revision at which a page (1-based) last changed."""
+        return self.page_revisions.get(page_num, 0)
+
+    def _touch(self, page_num: int):
+        self._begin_operation()
+        self._touched_pages.add(page_num)
+        self._page_cache.pop(page_num, None)
+        self.text_index.discard_page(page_num)
+
+    def _commit_revision(self):
+        """Bumps the revision for pages changed since the last save and notifies listeners."""
+        if not self._touched_pages:
+            return
+        pages = set(self._touched_pages)
+        self._touched_pages.clear()
+        self.revision += 1
+        for page_num in pages:
+            self.page_revisions[page_num] = self.revision
+        self._write_revisions()
+        if self.on_change:
+            try:
+                self.on_change(self, pages)
+            except Exception as e:
+                self._log(f"ON_CHANGE ERROR: {e}")
+
+    def _write_revisions(self):
+        """Atomically persists the revision counters (and whether edits are unflushed)."""
+        try:
+            target = revision_path(self.pdf_path)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(target)), suffix=".rev")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"revision": self.revision, "pages": self.page_revisions,
+                           "dirty": self._unflushed,
+                           "owner": current_process() if self._unflushed else None}, f)
+            os.replace(temp_path, target)
+        except Exception as e:
+            self._log(f"REVISION WRITE ERROR: {e}")
+
+    def _recover_lost_revisions(self):
+        """
+        Called when the sidecar says edits were never flushed and their owner
+        no longer holds them (it died, or set them aside). Those revisions
+        may already be in render caches and client ETags, so every page
+        moves to a fresh revision.
+        """
+        self._log(f"RECOVERING UNFLUSHED REVISIONS: {self.pdf_path}")
+        self.revision += 1
+        self.page_revisions = {n: self.revision for n in range(1, len(self.doc) + 1)}
+        self._write_revisions()
+
+    def _begin_operation(self):
+        """
+        In write-behind mode, journals the edit so a failure can be undone
+        alone. Every mutating method calls this before touching the document.
+        """
+        if not self.write_behind or self._in_operation:
+            return
+        if not self.doc.journal_is_enabled():
+            self.doc.journal_enable()
+        self._journal_step = self.doc.journal_position()[0]
+        self.doc.journal_start_op("edit")  # Unnamed operations are not undoable
+        self._in_operation = True
+
+    def _end_operation(self):
+        if self._in_operation:
+            self.doc.journal_stop_op()
+            self._in_operation = False
+
+    @property
+    def has_unflushed_changes(self) -> bool:
+        return self._unflushed
+
+    def _track_versions(self):
+        """Records how many incremental updates the open file already carries."""
+        # Both values describe the file as opened; PyMuPDF does not refresh
+        # them after saving, so later saves are counted by hand.
+        # A document parsed from memory has no file to append to until the
+        # first save rewrites it to pdf_path and reopens it from there.
+        self._can_increment = bool(self.doc.name) and bool(self.doc.can_save_incrementally())
+        self._incremental_saves = max(self.doc.version_count - 1, 0)
+        self._remember_disk_state()
+
+    def _remember_disk_state(self):
+        """Notes which file version this handle reflects, see is_stale()."""
+        self._disk_state = _disk_state(self.pdf_path)
+
+    def is_stale(self) -> bool:
+        """
+        True when the session file changed on disk behind this handle, i.e.
+        another worker process saved or rewrote it since we opened or last
+        saved it. Only meaningful while holding the session lock.
+        """
+        return _disk_state(self.pdf_path) != self._disk_state
 
     def _log(self, message: str):
         """Writes logs to a high-visibility file and prints to stdout."""
@@ -45,8 +339,153 @@ class AdvancedPDFEditor:
         except:
             return (0, 0, 0)
 
+    def _fitz_font(self, font_name: str) -> str:
+        """Maps an extracted font name to the closest built-in base-14 font."""
+        fn_lower = (font_name or "helv").lower()
+        if "bold" in fn_lower and "italic" in fn_lower: return "bi"
+        elif "bold" in fn_lower: return "hebo"
+        elif "italic" in fn_lower: return "heit"
+        elif "times" in fn_lower: return "tiro"
+        elif "courier" in fn_lower: return "cour"
+        return "helv"
+
+    def _discard_changes(self):
+        """Drops the failed edit's in-memory changes, keeping earlier unflushed edits."""
+        if self._in_operation:
+            # Undo just the failed edit; earlier unflushed edits are kept
+            try:
+                self._end_operation()
+                # MuPDF drops operations that changed nothing; only undo ours
+                if self.doc.journal_position()[0] > self._journal_step:
+                    self.doc.journal_undo()
+                for page_num in self._touched_pages:
+                    self._page_cache.pop(page_num, None)
+                    self.text_index.discard_page(page_num)
+                self._touched_pages.clear()
+                return
+            except Exception as e:
+                self._log(f"UNDO ERROR: {e}")
+        if self._unflushed:
+            # Reopening would silently drop acknowledged edits that only live
+            # in memory. Keep the document as it is and publish whatever the
+            # failed edit left on its pages as a new revision instead.
+            self._log(f"KEEPING UNFLUSHED CHANGES: {self.pdf_path}")
+            for page_num in self._touched_pages:
+                self._page_cache.pop(page_num, None)
+                self.text_index.discard_page(page_num)
+            self._commit_revision()
+            return
+        self._reload()
+
+    def _reload(self):
+        """
+        Reopens the session file from disk. Every memo is dropped and every
+        page moves to a fresh revision, so no cache or ETag keeps serving
+        content from the discarded handle.
+        """
+        try:
+            if self.doc and not self.doc.is_closed:
+                self.doc.close()
+            self.doc = fitz.open(self.pdf_path)
+            self._track_versions()
+        except Exception as e:
+            self._log(f"DISCARD ERROR: {e}")
+            return
+        self._page_cache.clear()
+        self.text_index = TextIndex()
+        self._touched_pages = set(range(1, len(self.doc) + 1))
+        self._commit_revision()
+
     def _safe_save(self, output_path: Optional[str] = None) -> bool:
-        """Robustly saves using atomic temporary file strategy."""
+        """
+        Saves pending changes.
+
+        Edits to the session file are appended as a PDF incremental update, so
+        the cost follows the size of the change rather than of the document.
+        A full compacting rewrite runs when the file already carries
+        MAX_INCREMENTAL_SAVES updates, when incremental saving is not
+        possible, or when writing to a different output path. In write-behind
+        mode in-place saves are deferred to flush().
+        """
+        target_path = os.path.abspath(output_path or self.pdf_path)
+        in_place = target_path == os.path.abspath(self.pdf_path)
+        if in_place and self.write_behind:
+            # Deferred: the change is live in memory and reaches disk on flush()
+            self._end_operation()
+            self._unflushed = True
+            self._commit_revision()
+            return True
+        saved = self._write(output_path, target_path, in_place)
+        if saved and in_place:
+            self._commit_revision()
+        return saved
+
+    def flush(self) -> bool:
+        """Writes deferred edits to the session file; a no-op when there are none."""
+        if not self._unflushed:
+            return True
+        if not self._write(None, os.path.abspath(self.pdf_path), True):
+            return False
+        self._mark_flushed()
+        return True
+
+    def _mark_flushed(self):
+        if self._unflushed:
+            self._unflushed = False
+            self._write_revisions()
+
+    def _write(self, output_path: Optional[str], target_path: str, in_place: bool) -> bool:
+        """Incremental append when possible, else a full atomic rewrite."""
+        saved = False
+        if in_place:
+            # Deduplicated uploads share storage; copy before appending in place
+            try:
+                ContentStore.ensure_private(self.pdf_path)
+            except Exception as e:
+                self._log(f"COPY-ON-WRITE ERROR: {e}")
+                return False
+        if (self.incremental and self._can_increment and in_place
+                and self._incremental_saves < self.MAX_INCREMENTAL_SAVES):
+            try:
+                # Appends after the previous EOF, so the last good revision stays intact
+                self.doc.save(self.doc.name, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+                _fsync_path(self.doc.name)
+                self._incremental_saves += 1
+                self._remember_disk_state()
+                saved = True
+            except Exception as e:
+                self._log(f"INCREMENTAL SAVE ERROR: {e}")
+        if not saved:
+            saved = self._rewrite(output_path)
+        return saved
+
+    def save_copy(self, path: str) -> bool:
+        """Writes the in-memory document to ``path``; the session file and its sidecar are left alone."""
+        try:
+            self.doc.save(path, garbage=3, deflate=True)
+            _fsync_path(path)
+            return True
+        except Exception as e:
+            self._log(f"COPY SAVE ERROR: {e}")
+            return False
+
+    def compact(self) -> bool:
+        """
+        Rewrites the session file with full garbage collection.
+
+        Incremental updates keep superseded objects (including redacted text)
+        in earlier revisions of the file, so this must run before the file
+        leaves the server.
+        """
+        if self._incremental_saves == 0 and not self.doc.is_dirty:
+            return True
+        if not self._rewrite():
+            return False
+        self._mark_flushed()
+        return True
+
+    def _rewrite(self, output_path: Optional[str] = None) -> bool:
+        """Robustly saves a compacted copy using atomic temporary file strategy."""
         temp_path = None
         try:
             target_path = os.path.abspath(output_path or self.pdf_path)
@@ -60,15 +499,15 @@ class AdvancedPDFEditor:
             os.close(fd)
             
             self.doc.save(temp_path, garbage=3, deflate=True, clean=True)
+            _fsync_path(temp_path)
             self.doc.close()
             
             success = False
             for attempt in range(10):
                 try:
-                    if os.path.exists(target_path):
-                        try: os.remove(target_path)
-                        except: pass
-                    os.rename(temp_path, target_path)
+                    # Never remove the target first: readers in other
+                    # processes must always find a complete file
+                    os.replace(temp_path, target_path)
                     success = True
                     break
                 except Exception as e:
@@ -79,91 +518,121 @@ class AdvancedPDFEditor:
                 raise Exception("Max attempts reached for file replace.")
             
             self.doc = fitz.open(target_path)
+            self._track_versions()
             return True
         except Exception as e:
             self._log(f"SAVE ERROR: {e}")
             if temp_path and os.path.exists(temp_path):
+                try:
+                    if self._unflushed and (not self.doc or self.doc.is_closed):
+                        # The copy just written is the only one holding the unflushed edits
+                        with open(temp_path, "rb") as f:
+                            self.doc = fitz.open(stream=f.read(), filetype="pdf")
+                        self._track_versions()
+                except Exception as reopen_error:
+                    self._log(f"REOPEN ERROR: {reopen_error}")
                 try: os.remove(temp_path)
                 except: pass
             try:
                 if not self.doc or self.doc.is_closed:
                     self.doc = fitz.open(self.pdf_path)
+                    self._track_versions()
             except: pass
             return False
 
-    def extract_text(self) -> Dict:
-        """Extracts text blocks with metadata for font preservation."""
-        result = {"pages": [], "fonts": {}}
-        for page_num, page in enumerate(self.doc):
-            page_data = {
-                "page": page_num + 1,
-                "width": page.rect.width,
-                "height": page.rect.height,
-                "blocks": []
-            }
-            page_fonts = page.get_fonts()
-            font_map = {f[3]: {"id": f[0], "ext": f[1], "type": f[2]} for f in page_fonts}
-
-            blocks = page.get_text("dict")["blocks"]
-            for block in blocks:
-                if block["type"] == 0:
-                    for line in block["lines"]:
-                        for span in line["spans"]:
-                            font_name = span["font"]
-                            font_info = font_map.get(font_name, {})
-                            page_data["blocks"].append({
-                                "text": span["text"],
-                                "bbox": span["bbox"],
-                                "font": font_name,
-                                "font_id": font_info.get("id"),
-                                "size": span["size"],
-                                "color": span["color"],
-                                "origin": span["origin"],
-                                "is_subset": "+" in font_name,
-                                "flags": span.get("flags", 0)
-                            })
-                            if font_name not in result["fonts"] and font_info.get("id"):
-                                result["fonts"][font_name] = {
-                                    "object_id": font_info["id"],
-                                    "type": font_info["type"]
-                                }
-            result["pages"].append(page_data)
-        return result
+    def page_sizes(self) -> List[Dict]:
+        """Page numbers and dimensions only; cheap enough to answer uploads immediately."""
+        return [
+            {"page": page.number + 1, "width": page.rect.width, "height": page.rect.height}
+            for page in self.doc
+        ]
+
+    def extract_page(self, page_num: int, memoize: bool = True) -> Dict:
+        """
+        Extracts text spans for one page (1-based) with font metadata.
+
+        Results are memoized per page (unless ``memoize`` is False) and
+        dropped as soon as the page is modified. The returned dict has the
+        extract_text() page layout plus a "fonts" map for the fonts used on
+        that page.
+        """
+        cached = self._page_cache.get(page_num)
+        if cached is not None:
+            return cached
+
+        page_data, lines = extract_page_data(self.doc[page_num - 1], page_num)
+        self.text_index.index_page(page_num, lines)
+        if memoize:
+            self._page_cache[page_num] = page_data
+        return page_data
+
+    def remember_pages(self, pages: List[Dict]):
+        """Seeds the per-page memo with extract_page() results computed elsewhere."""
+        for page_data in pages:
+            if page_data["page"] not in self._touched_pages:
+                self._page_cache[page_data["page"]] = page_data
+                self.text_index.index_page(page_data["page"], _span_lines(page_data["blocks"]))
+
+    def extract_text(self, start: int = 1, end: Optional[int] = None) -> Dict:
+        """Extracts text blocks with metadata for font preservation (pages start..end, 1-based)."""
+        end = len(self.doc) if end is None else min(end, len(self.doc))
+        return merge_page_extractions([self.extract_page(n) for n in range(max(start, 1), end + 1)])
+
+    def candidate_pages(self, needle: str) -> List[int]:
+        """Pages that may contain ``needle``, indexing any page not yet extracted."""
+        for page_num in range(1, len(self.doc) + 1):
+            if not self.text_index.is_indexed(page_num):
+                self.extract_page(page_num)
+        return self.text_index.candidate_pages(needle, len(self.doc))
+
+    def search(self, needle: str) -> List[Dict]:
+        """Finds ``needle`` like page.search_for(), visiting only candidate pages from the index."""
+        results = []
+        for page_num in self.candidate_pages(needle):
+            rects = self.doc[page_num - 1].search_for(needle)
+            if rects:
+                results.append({"page": page_num, "rects": [list(r) for r in rects]})
+        return results
 
     def replace_text(self, old_text: str, new_text: str, output_path: Optional[str] = None) -> bool:
         """Replaces exact text occurrences visually."""
         try:
-            for page in self.doc:
+            self._begin_operation()
+            for page_num in self.candidate_pages(old_text):
+                page = self.doc[page_num - 1]
                 hits = page.search_for(old_text)
+                if not hits:
+                    continue
+                self._touch(page_num)
                 for rect in hits:
                     page.add_redact_annot(rect)
                 page.apply_redactions()
+            if not self._touched_pages:
+                self._end_operation()
+                return True
             return self._safe_save(output_path)
         except Exception as e:
             self._log(f"REPLACE ERR: {e}")
+            self._discard_changes()
             return False
 
     def edit_text_at_rect(self, page_num: int, rect: list, new_text: str, font_name: str = "helv", font_size: float = 11, color: Any = (0, 0, 0), origin: Optional[list] = None, output_path: Optional[str] = None) -> bool:
         """Precisely replaces text at a specific rectangle."""
         self._log(f"EDIT REQ - PG {page_num} RECT {rect}")
         try:
+            self._begin_operation()
             if 0 <= page_num - 1 < len(self.doc):
                 page = self.doc[page_num - 1]
                 target_rect = fitz.Rect(rect)
                 
                 # 1. Redact
+                self._touch(page_num)
                 page.add_redact_annot(target_rect)
                 page.apply_redactions()
                 
                 # 2. Insert
                 insertion_point = origin if origin else (target_rect.x0, target_rect.y1 - 2)
-                fitz_font = "helv"
-                fn_lower = font_name.lower()
-                if "bold" in fn_lower and "italic" in fn_lower: fitz_font = "bi"
-                elif "bold" in fn_lower: fitz_font = "hebo"
-                elif "italic" in fn_lower: fitz_font = "heit"
-                elif "times" in fn_lower: fitz_font = "tiro"
-                elif "courier" in fn_lower: fitz_font = "cour"
+                fitz_font = self._fitz_font(font_name)
                 
                 rgb_color = self._normalize_color(color)
                 self._log(f"INSERT: '{new_text}' Color: {rgb_color}")
@@ -173,37 +642,140 @@ class AdvancedPDFEditor:
                 # 3. Save
                 return self._safe_save(output_path)
             self._log(f"PAGE {page_num} OUT OF RANGE")
+            self._end_operation()
             return False
         except Exception as e:
             self._log(f"EDIT ERR: {e}")
             self._log(traceback.format_exc())
+            self._discard_changes()
             return False
 
     def delete_text_at_rect(self, page_num: int, rect: list, output_path: Optional[str] = None) -> bool:
         """Deletes text within a specific rectangle."""
         try:
+            self._begin_operation()
             if 0 <= page_num - 1 < len(self.doc):
                 page = self.doc[page_num - 1]
+                self._touch(page_num)
                 page.add_redact_annot(fitz.Rect(rect))
                 page.apply_redactions()
                 return self._safe_save(output_path)
+            self._end_operation()
             return False
         except Exception as e:
             self._log(f"DEL ERR: {e}")
+            self._discard_changes()
             return False
 
     def add_text(self, page_num: int, text: str, x: float, y: float, font_size: float = 12, output_path: Optional[str] = None) -> bool:
         """Adds new text at position."""
         try:
+            self._begin_operation()
             if 0 <= page_num - 1 < len(self.doc):
                 page = self.doc[page_num - 1]
+                self._touch(page_num)
                 page.insert_text((x, y), text, fontsize=font_size, fontname="helv", color=(0, 0, 0))
                 return self._safe_save(output_path)
+            self._end_operation()
             return False
         except Exception as e:
             self._log(f"ADD ERR: {e}")
+            self._discard_changes()
             return False
 
+    def apply_operations(self, operations: List[Dict], output_path: Optional[str] = None) -> Dict:
+        """
+        Applies an ordered list of edits with a single save.
+
+        Supported operation types mirror the single-edit methods and take the
+        same keyword names: "replace" (old_text, new_text), "delete"
+        (page_num, rect), "add" (page_num, text, x, y, font_size) and "rect"
+        (page_num, rect, new_text, font_name, font_size, color, origin).
+        Redactions are queued per page so apply_redactions() runs once per
+        page; pages are flushed early only when a redaction follows text
+        already inserted on the same page, or before a "replace" searches
+        the document, which keeps the result identical to running the
+        operations one by one. A malformed operation fails only its own
+        entry in ``results``.
+        """
+        self._log(f"BATCH REQ - {len(operations)} OPS")
+        results: List[bool] = []
+        redactions: Dict[int, List[fitz.Rect]] = {}
+        insertions: Dict[int, List[Dict]] = {}
+
+        def flush(page_index: int):
+            page = self.doc[page_index]
+            self._touch(page_index + 1)
+            rects = redactions.pop(page_index, [])
+            for r in rects:
+                page.add_redact_annot(r)
+            if rects:
+                page.apply_redactions()
+            for ins in insertions.pop(page_index, []):
+                page.insert_text(ins["point"], ins["text"], fontname=ins["font"], fontsize=ins["size"], color=ins["color"])
+
+        def redact(page_index: int, rect: fitz.Rect):
+            if insertions.get(page_index):
+                flush(page_index)
+            redactions.setdefault(page_index, []).append(rect)
+
+        try:
+            self._begin_operation()
+            for op in operations:
+                error = _batch_op_error(op, len(self.doc))
+                if error:
+                    self._log(f"BATCH OP REJECTED: {error}")
+                    results.append(False)
+                    continue
+                op_type = op["type"]
+                if op_type == "replace":
+                    old_text = op["old_text"]
+                    # Search what the earlier operations leave behind, as running them one by one would
+                    for page_index in sorted(set(redactions) | set(insertions)):
+                        flush(page_index)
+                    for page_num in self.candidate_pages(old_text):
+                        for rect in self.doc[page_num - 1].search_for(old_text):
+                            redact(page_num - 1, rect)
+                    results.append(True)
+                    continue
+
+                page_index = op["page_num"] - 1
+                if op_type in ("rect", "delete"):
+                    target_rect = fitz.Rect(op["rect"])
+                    redact(page_index, target_rect)
+                    if op_type == "rect":
+                        origin = op.get("origin")
+                        insertions.setdefault(page_index, []).append({
+                            "point": origin if origin else (target_rect.x0, target_rect.y1 - 2),
+                            "text": op.get("new_text") or "",
+                            "font": self._fitz_font(op.get("font_name", "helv")),
+                            "size": op.get("font_size", 11),
+                            "color": self._normalize_color(op.get("color", (0, 0, 0))),
+                        })
+                else:
+                    insertions.setdefault(page_index, []).append({
+                        "point": (op.get("x", 0), op.get("y", 0)),
+                        "text": op.get("text") or "",
+                        "font": "helv",
+                        "size": op.get("font_size", 12),
+                        "color": (0, 0, 0),
+                    })
+                results.append(True)
+
+            for page_index in sorted(set(redactions) | set(insertions)):
+                flush(page_index)
+
+            if not any(results):
+                self._end_operation()
+                return {"success": False, "results": results}
+            return {"success": self._safe_save(output_path), "results": results}
+        except Exception as e:
+            self._log(f"BATCH ERR: {e}")
+            self._log(traceback.format_exc())
+            self._discard_changes()
+            # Nothing was applied
+            return {"success": False, "results": [False] * len(operations)}
+
     def close(self):
         if self.doc and not self.doc.is_closed:
             self.doc.close()
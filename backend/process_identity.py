@@ -0,0 +1,56 @@
+"""
+Process Identity Module
+Tells whether a recorded process is still the same running process, even
+after its PID has been reused
+"""
+import os
+from typing import Dict, Optional
+
+
+def process_start_time(pid: int) -> Optional[str]:
+    """
+    Identifies one run of a process as boot id plus start time, so a PID
+    reused after a restart (common in containers) does not match. None where
+    /proc is unavailable.
+    """
+    try:
+        with open(f"/proc/{pid}/stat", encoding="utf-8") as f:
+            stat = f.read()
+        with open("/proc/sys/kernel/random/boot_id", encoding="utf-8") as f:
+            boot_id = f.read().strip()
+        # The command name may contain spaces; fields after its closing paren
+        # are fixed, and starttime (field 22) is the 20th of them
+        start_ticks = stat[stat.rindex(")") + 2:].split()[19]
+        return f"{boot_id}:{start_ticks}"
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def current_process() -> Dict:
+    """This process as recorded by owners of shared state: {"pid", "started"}."""
+    pid = os.getpid()
+    return {"pid": pid, "started": process_start_time(pid)}
+
+
+def process_running(pid: Optional[int], started: Optional[str] = None) -> bool:
+    """
+    True while ``pid`` exists and, when ``started`` was recorded, is the same
+    run of it. Always False on Windows, where os.kill() would terminate the
+    process instead of probing it.
+    """
+    if not pid or os.name == "nt":
+        return False
+    if pid != os.getpid():
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        except OSError:
+            return False
+    if started:
+        current = process_start_time(pid)
+        if current is not None and current != started:
+            return False  # The PID now belongs to another process
+    return True
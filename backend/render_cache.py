@@ -0,0 +1,221 @@
+"""
+Render Cache Module
+Two-tier (memory + disk) cache of rasterized PDF pages
+"""
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, NamedTuple, Optional
+
+try:
+    import PIL  # noqa: F401 - Pixmap.pil_tobytes needs Pillow for WebP output
+    HAS_PILLOW = True
+except ImportError:
+    HAS_PILLOW = False
+
+IMAGE_MIMETYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "webp": "image/webp",
+}
+
+
+def encode_pixmap(pix, fmt: str) -> bytes:
+    """Encodes a fitz.Pixmap as png, jpg or webp bytes."""
+    if fmt == "png":
+        return pix.tobytes("png")
+    if fmt == "jpg":
+        return pix.tobytes("jpg", jpg_quality=85)
+    if fmt == "webp":
+        return pix.pil_tobytes(format="WEBP", quality=85)
+    raise ValueError(f"Unsupported image format: {fmt}")
+
+
+class RenderKey(NamedTuple):
+    """Identity of one rendered image.
+
+    ``revision`` is the document revision at which the page last changed,
+    so an edit to page 3 produces new keys for page 3 only.
+    """
+    session_id: str
+    revision: int
+    page: int
+    dpi: float
+    fmt: str
+    tile: str = ""  # "<zoom>_<x>_<y>" for clipped tiles, empty for whole pages
+
+    def filename(self) -> str:
+        suffix = f"-t{self.tile}" if self.tile else ""
+        return f"p{self.page}-r{self.revision}-{self.dpi:g}{suffix}.{self.fmt}"
+
+
+class RenderCache:
+    """In-memory LRU of encoded page images backed by a disk tier.
+
+    Disk entries live under ``<cache_dir>/<session_id>/`` and survive process
+    restarts; both tiers are bounded by bytes and evict least recently used
+    entries first.
+    """
+
+    def __init__(self, cache_dir: str, max_memory_bytes: int = 128 * 1024 * 1024,
+                 max_disk_bytes: int = 1024 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[RenderKey, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"memoryHits": 0, "diskHits": 0, "misses": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._disk_bytes = self._scan_disk_bytes()
+
+    def _scan_disk_bytes(self) -> int:
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def _session_dir(self, session_id: str) -> str:
+        return os.path.join(self.cache_dir, os.path.basename(session_id))
+
+    def _disk_path(self, key: RenderKey) -> str:
+        return os.path.join(self._session_dir(key.session_id), key.filename())
+
+    def get(self, key: RenderKey) -> Optional[bytes]:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._stats["memoryHits"] += 1
+                return data
+
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # LRU order for disk eviction follows mtime
+        except OSError:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+
+        with self._lock:
+            self._stats["diskHits"] += 1
+            self._remember(key, data)
+        return data
+
+    def put(self, key: RenderKey, data: bytes):
+        with self._lock:
+            self._remember(key, data)
+        try:
+            session_dir = self._session_dir(key.session_id)
+            os.makedirs(session_dir, exist_ok=True)
+            path = self._disk_path(key)
+            replaced = os.path.getsize(path) if os.path.exists(path) else 0
+            fd, temp_path = tempfile.mkstemp(dir=session_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            with self._lock:
+                self._disk_bytes += len(data) - replaced
+                over_budget = self._disk_bytes > self.max_disk_bytes
+            if over_budget:
+                self._evict_disk()
+        except OSError as e:
+            print(f"✗ Error writing render cache entry {key.filename()}: {e}")
+
+    def _remember(self, key: RenderKey, data: bytes):
+        """Adds to the memory tier; caller holds the lock."""
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        if len(data) > self.max_memory_bytes:
+            return
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _evict_disk(self):
+        """Deletes the oldest disk entries until the tier is back under 90% of budget."""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_disk_bytes * 0.9)
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_bytes = total
+
+    def invalidate(self, session_id: str, pages: Optional[Iterable[int]] = None):
+        """
+        Drops cached renders for a session.
+
+        With ``pages`` only those pages are dropped; otherwise the whole
+        session is. Stale entries could never be hit anyway because keys carry
+        the page revision, this just frees their space early.
+        """
+        page_set = set(pages) if pages is not None else None
+        with self._lock:
+            for key in [k for k in self._memory if k.session_id == session_id]:
+                if page_set is None or key.page in page_set:
+                    self._memory_bytes -= len(self._memory.pop(key))
+
+        session_dir = self._session_dir(session_id)
+        if page_set is None:
+            freed = self._dir_bytes(session_dir)
+            shutil.rmtree(session_dir, ignore_errors=True)
+        else:
+            freed = 0
+            prefixes = tuple(f"p{page}-" for page in page_set)
+            try:
+                names = os.listdir(session_dir)
+            except OSError:
+                names = []
+            for name in names:
+                if name.startswith(prefixes):
+                    path = os.path.join(session_dir, name)
+                    try:
+                        size = os.path.getsize(path)
+                        os.remove(path)
+                        freed += size
+                    except OSError:
+                        pass
+        with self._lock:
+            self._disk_bytes = max(self._disk_bytes - freed, 0)
+
+    @staticmethod
+    def _dir_bytes(path: str) -> int:
+        total = 0
+        try:
+            for name in os.listdir(path):
+                total += os.path.getsize(os.path.join(path, name))
+        except OSError:
+            pass
+        return total
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._stats, memoryBytes=self._memory_bytes, diskBytes=self._disk_bytes,
+                        memoryEntries=len(self._memory))
@@ -0,0 +1,224 @@
+"""
+Session Lock Module
+Reader/writer locking for session files across threads and worker processes
+"""
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:  # Windows: the dev server runs a single process
+    HAS_FCNTL = False
+
+
+def lock_path(pdf_path: str) -> str:
+    """Lock file guarding a session PDF and its sidecars."""
+    return pdf_path + ".lock"
+
+
+def dirty_claim_path(pdf_path: str) -> str:
+    """Lock file held by the process whose memory has unflushed edits to the session."""
+    return pdf_path + ".dirty"
+
+
+def flush_request_path(pdf_path: str) -> str:
+    """Marker a process leaves to ask the holder of the dirty claim to flush now."""
+    return pdf_path + ".flush"
+
+
+def dirty_claim_held(pdf_path: str) -> Optional[bool]:
+    """
+    True when some open descriptor, in any process (this one included),
+    holds the session's dirty claim. None without fcntl, where it cannot
+    be told.
+    """
+    if not HAS_FCNTL:
+        return None
+    try:
+        fd = os.open(dirty_claim_path(pdf_path), os.O_RDWR | os.O_CREAT, 0o644)
+    except OSError:
+        return None
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        return False
+    except BlockingIOError:
+        return True
+    finally:
+        os.close(fd)
+
+
+class RWLock:
+    """Writer-preferring reader/writer lock for threads.
+
+    Any number of readers may hold it together; a writer waits for them to
+    drain and blocks new readers meanwhile, so a stream of renders cannot
+    starve an edit. Not reentrant.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    def acquire_read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self, blocking: bool = True) -> bool:
+        with self._cond:
+            if not blocking and (self._writer or self._readers):
+                return False
+            self._waiting_writers += 1
+            try:
+                while self._writer or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = True
+            return True
+
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+
+class FileLock:
+    """flock()-based shared/exclusive lock on ``<pdf>.lock``.
+
+    Each acquisition opens its own descriptor, so the lock also excludes
+    other threads of the same process. Without fcntl it is a no-op.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @contextmanager
+    def _locked(self, mode: int) -> Iterator[None]:
+        if not HAS_FCNTL:
+            yield
+            return
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, mode)
+            yield
+        finally:
+            os.close(fd)  # Closing the descriptor releases the lock
+
+    def shared(self):
+        return self._locked(fcntl.LOCK_SH if HAS_FCNTL else 0)
+
+    def exclusive(self):
+        return self._locked(fcntl.LOCK_EX if HAS_FCNTL else 0)
+
+
+class SessionLock:
+    """Thread reader/writer lock plus the cross-process file lock for one session.
+
+    Readers are anything that reads the session file or its revision
+    sidecar; writers are anything that saves, rewrites or flushes it. The
+    thread lock is always taken before the file lock.
+
+    The dirty claim marks edits that are acknowledged but only in this
+    process's memory. While one lock object holds it, every other process
+    (and every other lock object for the file) sees peer_dirty() and must
+    not use the file until the holder has flushed; request_flush() asks the
+    holder to do that now. A process that dies drops the claim with it.
+    """
+
+    def __init__(self, pdf_path: str):
+        self.pdf_path = pdf_path
+        self.rw = RWLock()
+        self.file = FileLock(lock_path(pdf_path))
+        self._claim_fd: Optional[int] = None
+        self._claim_lock = threading.Lock()
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        self.rw.acquire_read()
+        try:
+            with self.file.shared():
+                yield
+        finally:
+            self.rw.release_read()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        self.rw.acquire_write()
+        try:
+            with self.file.exclusive():
+                yield
+        finally:
+            self.rw.release_write()
+
+    @contextmanager
+    def try_write(self) -> Iterator[bool]:
+        """Like write() but yields False instead of waiting for the thread lock."""
+        if not self.rw.acquire_write(blocking=False):
+            yield False
+            return
+        try:
+            with self.file.exclusive():
+                yield True
+        finally:
+            self.rw.release_write()
+
+    # Dirty claim
+
+    @property
+    def holds_dirty(self) -> bool:
+        return self._claim_fd is not None
+
+    def claim_dirty(self) -> bool:
+        """Takes the dirty claim (a no-op if held); False when another holder has it."""
+        if not HAS_FCNTL:
+            return True
+        with self._claim_lock:
+            if self._claim_fd is not None:
+                return True
+            fd = os.open(dirty_claim_path(self.pdf_path), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+            self._claim_fd = fd
+            return True
+
+    def release_dirty(self):
+        """Drops the dirty claim once the edits are on disk (or deliberately discarded)."""
+        with self._claim_lock:
+            fd, self._claim_fd = self._claim_fd, None
+        if fd is None:
+            return
+        os.close(fd)  # Closing the descriptor releases the lock
+        try:
+            os.remove(flush_request_path(self.pdf_path))
+        except OSError:
+            pass
+
+    def peer_dirty(self) -> bool:
+        """True while someone other than this lock object holds the dirty claim."""
+        return not self.holds_dirty and bool(dirty_claim_held(self.pdf_path))
+
+    def request_flush(self):
+        try:
+            with open(flush_request_path(self.pdf_path), "a"):
+                pass
+        except OSError as e:
+            print(f"✗ Error requesting flush of {self.pdf_path}: {e}")
+
+    def flush_requested(self) -> bool:
+        return os.path.exists(flush_request_path(self.pdf_path))
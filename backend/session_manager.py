@@ -0,0 +1,287 @@
+"""
+Session Manager Module
+Tracks editor sessions, expires idle ones and keeps uploads/ and
+word_files/ within a disk budget
+"""
+import glob
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from content_store import ContentStore
+from document_workers import DocumentRouter
+from pdf_editor import revision_path
+from render_cache import RenderCache
+from session_lock import dirty_claim_path, flush_request_path, lock_path
+from session_store import SessionStore
+
+# Leftovers from interrupted writes (upload streaming, atomic saves, copy-on-write)
+TEMP_SUFFIXES = ('.part', '.tmp', '.cow', '.rev', '.html')
+TEMP_MAX_AGE = 3600
+# Blobs younger than this are never collected, so an upload that was just
+# stored but not yet linked to its session is not lost
+BLOB_GRACE_SECONDS = 300
+# Last access is written to the session store at most this often per worker
+TOUCH_INTERVAL = 60
+
+
+class SessionManager:
+    """Owns the lifecycle of session files and everything derived from them.
+
+    Session metadata, including last access, lives in the shared
+    SessionStore, so every worker process sees activity from the others.
+    Session files without a row (created before the store existed, or not
+    yet registered) fall back to their mtime. A background janitor thread
+    removes sessions idle longer than the TTL, then evicts least recently
+    used sessions while storage exceeds the disk budget, and finally
+    collects orphaned blobs and stale temporary files. Every worker runs a
+    janitor, but a lease in the store lets only one of them sweep per
+    interval. Open document memory is bounded by the document pool, which
+    this manager reports on.
+    """
+
+    def __init__(self, upload_folder: str, word_folder: str, pool: DocumentRouter,
+                 render_cache: RenderCache, content_store: ContentStore, store: SessionStore,
+                 ttl_seconds: int = 6 * 3600, disk_budget_bytes: int = 2 * 1024 * 1024 * 1024,
+                 interval_seconds: int = 300):
+        self.upload_folder = upload_folder
+        self.word_folder = word_folder
+        self.pool = pool
+        self.render_cache = render_cache
+        self.content_store = content_store
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.disk_budget_bytes = disk_budget_bytes
+        self.interval_seconds = interval_seconds
+        self._touched: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._janitor: Optional[threading.Thread] = None
+        self._last_sweep: Dict = {}
+
+    # Session lookup
+
+    def session_path(self, session_id: str) -> str:
+        return os.path.join(self.upload_folder, session_id)
+
+    def resolve(self, session_id: Optional[str]) -> Optional[str]:
+        """
+        Path of an existing session's PDF, recording the access; None if the
+        ID is malformed or the session no longer exists.
+        """
+        if not session_id or os.path.basename(session_id) != session_id or not session_id.endswith('.pdf'):
+            return None
+        path = self.session_path(session_id)
+        if not os.path.isfile(path):
+            return None
+        self.touch(session_id)
+        return path
+
+    def touch(self, session_id: str):
+        now = time.time()
+        with self._lock:
+            previous = self._touched.get(session_id, 0)
+            if now - previous < TOUCH_INTERVAL:
+                return
+            self._touched[session_id] = now
+        try:
+            self.store.touch(session_id, self.ttl_seconds)
+        except Exception as e:
+            print(f"✗ Error recording session access: {e}")
+
+    def register(self, session_id: str, **fields):
+        """Records a new or reopened session and its metadata (see SessionStore.update)."""
+        with self._lock:
+            self._touched[session_id] = time.time()
+        self.store.touch(session_id, self.ttl_seconds, **fields)
+
+    def update(self, session_id: str, **fields):
+        """Updates metadata of a known session; failures are logged, never raised."""
+        try:
+            self.store.update(session_id, **fields)
+        except Exception as e:
+            print(f"✗ Error updating session metadata: {e}")
+
+    def metadata(self, session_id: str) -> Optional[Dict]:
+        return self.store.get(session_id)
+
+    def _list_sessions(self) -> List[Tuple[str, float]]:
+        """(session_id, last_access) for every session file on disk."""
+        sessions = []
+        try:
+            entries = list(os.scandir(self.upload_folder))
+        except OSError:
+            return sessions
+        known = self.store.last_access()
+        for entry in entries:
+            if not entry.is_file() or not entry.name.endswith('.pdf'):
+                continue
+            try:
+                mtime = entry.stat().st_mtime
+            except OSError:
+                continue
+            sessions.append((entry.name, max(mtime, known.get(entry.name, 0))))
+        return sessions
+
+    # Removal
+
+    def remove_session(self, session_id: str):
+        """Closes the session's document and deletes its PDF, sidecars, lock files, Word exports, conflict copies and renders."""
+        self.pool.discard(session_id)
+        self.render_cache.invalidate(session_id)
+        stem = os.path.splitext(session_id)[0]
+        # Word exports are named <stem>.docx or <stem>.r<revision>[.p<range>].docx
+        word_exports = glob.glob(os.path.join(self.word_folder, glob.escape(stem) + ".*docx"))
+        pdf_path = self.session_path(session_id)
+        # Snapshots (<pdf>.<id>.snap) are left behind only if a conversion died
+        snapshots = glob.glob(glob.escape(pdf_path) + ".*.snap")
+        # Conflict copies hold deferred edits that lost to another process's save
+        conflicts = glob.glob(glob.escape(pdf_path) + ".*.conflict")
+        for path in (pdf_path, revision_path(pdf_path), lock_path(pdf_path),
+                     dirty_claim_path(pdf_path), flush_request_path(pdf_path),
+                     *word_exports, *snapshots, *conflicts):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"✗ Error removing {path}: {e}")
+        self.store.delete(session_id)
+        with self._lock:
+            self._touched.pop(session_id, None)
+
+    # Janitor
+
+    def start_janitor(self):
+        if self._janitor is not None and self._janitor.is_alive():
+            return
+        self._stop.clear()
+        self._janitor = threading.Thread(target=self._run_janitor, name="session-janitor", daemon=True)
+        self._janitor.start()
+
+    def stop_janitor(self):
+        self._stop.set()
+        if self._janitor is not None:
+            self._janitor.join(timeout=5)
+
+    def _run_janitor(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                # Slightly shorter than the interval, so the holder renews it next time
+                if self.store.try_lease("janitor", self.interval_seconds * 0.9):
+                    self.sweep()
+            except Exception as e:
+                print(f"✗ Session janitor error: {e}")
+
+    def sweep(self) -> Dict:
+        """One janitor pass; returns what it removed."""
+        now = time.time()
+        expired = 0
+        evicted = 0
+
+        sessions = self._list_sessions()
+        live = []
+        for session_id, last_access in sessions:
+            if now - last_access > self.ttl_seconds:
+                self.remove_session(session_id)
+                expired += 1
+            else:
+                live.append((session_id, last_access))
+
+        self._remove_older_than(self.word_folder, self.ttl_seconds, suffixes=None)
+        self._remove_older_than(self.upload_folder, TEMP_MAX_AGE, suffixes=TEMP_SUFFIXES, recursive=True)
+        blobs_removed = self._collect_blobs(now)
+
+        used = self.disk_usage()
+        live.sort(key=lambda s: s[1])
+        while used > self.disk_budget_bytes and live:
+            session_id, _ = live.pop(0)
+            self.remove_session(session_id)
+            evicted += 1
+            blobs_removed += self._collect_blobs(now)
+            used = self.disk_usage()
+
+        self._last_sweep = {
+            "at": now,
+            "expired": expired,
+            "evicted": evicted,
+            "blobsRemoved": blobs_removed,
+        }
+        return self._last_sweep
+
+    def _collect_blobs(self, now: float) -> int:
+        """Deletes stored uploads no session links to any more, with their extraction cache."""
+        removed = 0
+        try:
+            entries = list(os.scandir(self.content_store.blob_dir))
+        except OSError:
+            return 0
+        for entry in entries:
+            if not entry.name.endswith('.pdf'):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            if st.st_nlink > 1 or now - st.st_mtime < BLOB_GRACE_SECONDS:
+                continue
+            digest = entry.name[:-len('.pdf')]
+            for path in (entry.path, os.path.join(self.content_store.extract_dir, f"{digest}.json")):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            removed += 1
+        return removed
+
+    @staticmethod
+    def _remove_older_than(folder: str, max_age: float, suffixes: Optional[Tuple[str, ...]],
+                           recursive: bool = False):
+        cutoff = time.time() - max_age
+        for root, _, files in os.walk(folder):
+            for name in files:
+                if suffixes is not None and not name.endswith(suffixes):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    if os.stat(path).st_mtime < cutoff:
+                        os.remove(path)
+                except OSError:
+                    pass
+            if not recursive:
+                break
+
+    # Reporting
+
+    def disk_usage(self) -> int:
+        """Bytes used under uploads/ and word_files/, counting hard-linked files once."""
+        seen = set()
+        total = 0
+        for folder in (self.upload_folder, self.word_folder):
+            for root, _, files in os.walk(folder):
+                for name in files:
+                    try:
+                        st = os.stat(os.path.join(root, name))
+                    except OSError:
+                        continue
+                    if (st.st_dev, st.st_ino) in seen:
+                        continue
+                    seen.add((st.st_dev, st.st_ino))
+                    total += st.st_size
+        return total
+
+    def stats(self) -> Dict:
+        now = time.time()
+        sessions = self._list_sessions()
+        return {
+            "sessions": len(sessions),
+            "store": self.store.stats(),
+            "activeSessions": sum(1 for _, t in sessions if now - t < TOUCH_INTERVAL * 15),
+            "diskBytes": self.disk_usage(),
+            "diskBudgetBytes": self.disk_budget_bytes,
+            "ttlSeconds": self.ttl_seconds,
+            "documentPool": self.pool.stats(),
+            "renderCache": self.render_cache.stats(),
+            "lastSweep": self._last_sweep,
+        }
@@ -0,0 +1,142 @@
+"""
+Session Store Module
+Session metadata in SQLite, shared by every worker process on the instance
+so requests for a session can land on any of them
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+# Columns callers may set through update(); maps API names to SQL columns
+UPDATABLE_FIELDS = {
+    "revision": "revision",
+    "pageCount": "page_count",
+    "contentHash": "content_hash",
+    "wordExport": "word_export",
+}
+
+
+class SessionStore:
+    """Per-session metadata rows plus named leases, in one WAL-mode database.
+
+    A row holds the session's document revision, page count, content hash,
+    the Word export it last produced, when it was last used and when it
+    expires, and the worker (pid) that last served it. Each thread uses its
+    own connection; WAL lets readers in any worker proceed while another
+    worker writes.
+
+    Leases let one worker at a time run instance-wide chores such as the
+    session janitor.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                owner INTEGER,
+                revision INTEGER NOT NULL DEFAULT 0,
+                page_count INTEGER,
+                content_hash TEXT,
+                word_export TEXT,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires_at)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS leases (
+                name TEXT PRIMARY KEY,
+                owner INTEGER NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Durability of a touch is not worth an fsync per request
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # Sessions
+
+    def touch(self, session_id: str, ttl_seconds: float, **fields):
+        """Records an access by this worker, creating the row if needed, and sets any ``fields``."""
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO sessions (id, owner, created_at, last_access, expires_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET owner = excluded.owner, last_access = excluded.last_access, "
+            "expires_at = excluded.expires_at",
+            (session_id, os.getpid(), now, now, now + ttl_seconds),
+        )
+        if fields:
+            self.update(session_id, **fields)
+
+    def update(self, session_id: str, **fields):
+        """Sets metadata fields (revision, pageCount, contentHash, wordExport) on an existing row."""
+        columns = [(UPDATABLE_FIELDS[name], value) for name, value in fields.items()]
+        if not columns:
+            return
+        assignments = ", ".join(f"{column} = ?" for column, _ in columns)
+        self._connect().execute(f"UPDATE sessions SET {assignments} WHERE id = ?",
+                                (*(value for _, value in columns), session_id))
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        row = self._connect().execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return _session_dict(row) if row is not None else None
+
+    def delete(self, session_id: str):
+        self._connect().execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def last_access(self) -> Dict[str, float]:
+        """session_id -> last access time, for every known session."""
+        return {row["id"]: row["last_access"] for row in
+                self._connect().execute("SELECT id, last_access FROM sessions")}
+
+    # Leases
+
+    def try_lease(self, name: str, seconds: float) -> bool:
+        """
+        Takes or renews the named lease for this process. Returns False while
+        another live holder's lease has not yet expired.
+        """
+        now = time.time()
+        pid = os.getpid()
+        cursor = self._connect().execute(
+            "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE leases.owner = ? OR leases.expires_at < ?",
+            (name, pid, now + seconds, pid, now),
+        )
+        return cursor.rowcount == 1
+
+    def stats(self) -> Dict:
+        row = self._connect().execute(
+            "SELECT COUNT(*) AS n, COUNT(DISTINCT owner) AS owners FROM sessions").fetchone()
+        return {"sessions": row["n"], "owners": row["owners"]}
+
+
+def _session_dict(row: sqlite3.Row) -> Dict:
+    return {
+        "sessionId": row["id"],
+        "owner": row["owner"],
+        "revision": row["revision"],
+        "pageCount": row["page_count"],
+        "contentHash": row["content_hash"],
+        "wordExport": row["word_export"],
+        "createdAt": row["created_at"],
+        "lastAccess": row["last_access"],
+        "expiresAt": row["expires_at"],
+    }
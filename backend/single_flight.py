@@ -0,0 +1,76 @@
+"""
+Single Flight Module
+Coalesces identical concurrent computations so duplicates wait for the one
+in flight and share its result
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    __slots__ = ("done", "result", "shared", "error", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.shared = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """Runs at most one computation per key at a time.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it runs wait and receive the same result, or the same
+    exception. Nothing is cached: once the leader finishes, the next caller
+    starts a new computation.
+
+    ``share`` converts the leader's result into what followers get, for
+    results only one caller may consume (e.g. a shared memory handle). It
+    runs only when there are followers, and the leader keeps the original.
+    """
+
+    def __init__(self, share: Optional[Callable[[Any], Any]] = None):
+        self._share = share
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._leaders = 0
+        self._coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._leaders += 1
+            else:
+                call.followers += 1
+                self._coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.shared
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]  # Later callers start a fresh computation
+            if call.error is None and call.followers:
+                try:
+                    call.shared = self._share(call.result) if self._share else call.result
+                except BaseException as e:
+                    call.error = e
+            call.done.set()
+        return call.result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"leaders": self._leaders, "coalesced": self._coalesced, "inFlight": len(self._calls)}
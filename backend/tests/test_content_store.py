@@ -0,0 +1,37 @@
+"""
+Content Store Tests
+"""
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from content_store import ContentStore
+
+CONTENT = b"%PDF-1.4 same bytes every time"
+
+
+def test_reupload_links_an_orphaned_blob_before_it_can_be_collected(tmp_path):
+    store = ContentStore(str(tmp_path))
+    digest, blob = store.save_stream(io.BytesIO(CONTENT))
+    # An orphan the collector is about to take: no session links, old mtime
+    os.utime(blob, (0, 0))
+
+    session_path = str(tmp_path / "session.pdf")
+    assert store.save_stream(io.BytesIO(CONTENT), session_path=session_path) == (digest, blob)
+    assert os.stat(blob).st_nlink == 2
+
+    # Even if the collector had already decided to remove the blob
+    os.remove(blob)
+    with open(session_path, "rb") as f:
+        assert f.read() == CONTENT
+    assert not [name for name in os.listdir(store.blob_dir) if name.endswith(".part")]
+
+
+def test_upload_of_new_content_stores_and_links_it(tmp_path):
+    store = ContentStore(str(tmp_path))
+    session_path = str(tmp_path / "session.pdf")
+    digest, blob = store.save_stream(io.BytesIO(CONTENT), session_path=session_path)
+    assert os.path.basename(blob) == f"{digest}.pdf"
+    assert os.path.samefile(blob, session_path)
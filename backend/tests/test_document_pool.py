@@ -0,0 +1,119 @@
+"""
+Document Pool Tests
+Two pools on one session file stand in for two worker processes: their
+session locks use separate descriptors on the same lock files
+"""
+import glob
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import fitz  # PyMuPDF
+import pytest
+
+from document_pool import DocumentPool, SessionConflictError
+from pdf_editor import AdvancedPDFEditor, read_revisions
+
+SESSION = "session.pdf"
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = str(tmp_path / SESSION)
+    doc = fitz.open()
+    for n in range(2):
+        doc.new_page().insert_text((72, 72), f"Original text on page {n + 1}")
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def edit(pool, pdf_path, page_num, text):
+    with pool.acquire(SESSION, pdf_path, write=True) as editor:
+        assert editor.edit_text_at_rect(page_num, [72, 100, 400, 130], text)
+        return editor.revision
+
+
+def page_text(pdf_path, page_num):
+    with fitz.open(pdf_path) as doc:
+        return doc[page_num - 1].get_text()
+
+
+def test_flush_never_overwrites_another_pools_save(pdf_path):
+    writer_behind = DocumentPool(write_behind=True, flush_delay=3600, flush_max_delay=3600)
+    other = DocumentPool()
+    try:
+        edit(writer_behind, pdf_path, 1, "Deferred edit")
+        # Waits for the writer to flush on request before editing the file
+        other_revision = edit(other, pdf_path, 2, "Saved edit")
+        writer_behind.flush(SESSION)
+
+        assert "Deferred edit" in page_text(pdf_path, 1)
+        assert "Saved edit" in page_text(pdf_path, 2)
+        assert read_revisions(pdf_path)["revision"] == other_revision
+        assert other.stats()["peerWaits"] == 1
+        assert not glob.glob(pdf_path + ".*.conflict")
+    finally:
+        writer_behind.close_all()
+        other.close_all()
+
+
+def test_live_owner_keeps_its_revisions(pdf_path):
+    writer_behind = DocumentPool(write_behind=True, flush_delay=3600, flush_max_delay=3600)
+    try:
+        revision = edit(writer_behind, pdf_path, 1, "Deferred edit")
+        revisions = read_revisions(pdf_path)
+        assert revisions["dirty"] and revisions["owner"]["pid"] == os.getpid()
+
+        # Opening the file elsewhere must not treat the marker as a crash
+        editor = AdvancedPDFEditor(pdf_path)
+        editor.close()
+        assert read_revisions(pdf_path)["revision"] == revision
+    finally:
+        writer_behind.close_all()
+    assert "Deferred edit" in page_text(pdf_path, 1)
+    assert not read_revisions(pdf_path)["dirty"]
+
+
+def test_dead_owner_revisions_are_recovered(pdf_path):
+    script = (
+        "import os, sys\n"
+        "from document_pool import DocumentPool\n"
+        "pool = DocumentPool(write_behind=True, flush_delay=3600, flush_max_delay=3600)\n"
+        "with pool.acquire('session.pdf', sys.argv[1], write=True) as editor:\n"
+        "    editor.edit_text_at_rect(1, [72, 100, 400, 130], 'Lost edit')\n"
+        "os._exit(0)\n"
+    )
+    subprocess.run([sys.executable, "-c", script, pdf_path], cwd=BACKEND_DIR, check=True)
+    revisions = read_revisions(pdf_path)
+    assert revisions["dirty"]
+
+    editor = AdvancedPDFEditor(pdf_path)
+    editor.close()
+    recovered = read_revisions(pdf_path)
+    assert recovered["revision"] == revisions["revision"] + 1
+    assert set(recovered["pages"].values()) == {recovered["revision"]}
+    assert not recovered["dirty"]
+
+
+def test_stale_flush_raises_and_reopens(pdf_path):
+    writer_behind = DocumentPool(write_behind=True, flush_delay=3600, flush_max_delay=3600)
+    try:
+        edit(writer_behind, pdf_path, 1, "Deferred edit")
+        # Another process saves the file without going through any pool
+        doc = fitz.open(pdf_path)
+        doc[1].insert_text((72, 200), "Written elsewhere")
+        doc.saveIncr()
+        doc.close()
+
+        with pytest.raises(SessionConflictError):
+            writer_behind.flush(SESSION)
+        assert "Written elsewhere" in page_text(pdf_path, 2)
+        assert writer_behind.stats()["conflicts"] == 1
+        with writer_behind.acquire(SESSION, pdf_path) as editor:
+            assert "Written elsewhere" in editor.doc[1].get_text()
+    finally:
+        writer_behind.close_all()
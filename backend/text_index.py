@@ -0,0 +1,110 @@
+"""
+Text Index Module
+Per-document word/trigram index used to narrow search and replace to the
+pages that can actually contain a needle
+"""
+from typing import Dict, Iterable, List, Optional, Set
+
+
+def _tokens(text: str) -> List[str]:
+    # page.search_for() ignores case, so the index does too
+    return text.lower().split()
+
+
+def _trigrams(token: str) -> Set[str]:
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class TextIndex:
+    """Inverted index from words and trigrams to page numbers.
+
+    Pages are indexed from extracted line text. A page whose content changes
+    is dropped from the index until it is extracted again, and unindexed pages
+    are always returned as candidates, so the index can only narrow a search,
+    never hide a hit.
+    """
+
+    def __init__(self):
+        self._words: Dict[str, Set[int]] = {}
+        self._trigrams: Dict[str, Set[int]] = {}
+        self._page_keys: Dict[int, tuple] = {}
+
+    def index_page(self, page_num: int, lines: Iterable[Iterable[str]]):
+        """
+        (Re)indexes a page from its lines, in reading order, each given as
+        the texts of its spans.
+        """
+        self.discard_page(page_num)
+        words: Set[str] = set()
+        previous = ""
+        for line in lines:
+            spans = list(line)
+            # search_for() matches across span boundaries within a line, so a
+            # word split over spans ("Con" + bold "tract") is indexed whole;
+            # spans are joined as-is, whitespace is part of their text
+            tokens = _tokens("".join(spans))
+            if previous.endswith("-") and tokens:
+                # search_for() dehyphenates across lines; index the joined word too
+                words.add(previous[:-1] + tokens[0])
+            words.update(tokens)
+            if len(spans) > 1:
+                # Lines may have been grouped heuristically; the spans' own
+                # words keep the index a superset either way
+                for text in spans:
+                    words.update(_tokens(text))
+            if tokens:
+                previous = tokens[-1]
+        trigrams: Set[str] = set()
+        for word in words:
+            trigrams |= _trigrams(word)
+        for word in words:
+            self._words.setdefault(word, set()).add(page_num)
+        for gram in trigrams:
+            self._trigrams.setdefault(gram, set()).add(page_num)
+        self._page_keys[page_num] = (words, trigrams)
+
+    def discard_page(self, page_num: int):
+        keys = self._page_keys.pop(page_num, None)
+        if keys is None:
+            return
+        words, trigrams = keys
+        for word in words:
+            pages = self._words.get(word)
+            if pages is not None:
+                pages.discard(page_num)
+                if not pages:
+                    del self._words[word]
+        for gram in trigrams:
+            pages = self._trigrams.get(gram)
+            if pages is not None:
+                pages.discard(page_num)
+                if not pages:
+                    del self._trigrams[gram]
+
+    def is_indexed(self, page_num: int) -> bool:
+        return page_num in self._page_keys
+
+    def candidate_pages(self, needle: str, page_count: int) -> List[int]:
+        """
+        Pages (1-based, ascending) that may contain ``needle``.
+
+        Every token of 3+ characters must have all its trigrams on the page;
+        shorter tokens strictly inside the needle must appear as whole words.
+        Pages not in the index are always included.
+        """
+        tokens = _tokens(needle)
+        candidates: Optional[Set[int]] = None
+        for i, token in enumerate(tokens):
+            if len(token) >= 3:
+                for gram in _trigrams(token):
+                    pages = self._trigrams.get(gram, set())
+                    candidates = set(pages) if candidates is None else candidates & pages
+            elif 0 < i < len(tokens) - 1:
+                pages = self._words.get(token, set())
+                candidates = set(pages) if candidates is None else candidates & pages
+            if candidates is not None and not candidates:
+                break
+        unindexed = {n for n in range(1, page_count + 1) if n not in self._page_keys}
+        if candidates is None:
+            return list(range(1, page_count + 1))
+        return sorted((candidates & set(range(1, page_count + 1))) | unindexed)
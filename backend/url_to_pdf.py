@@ -1,7 +1,171 @@
 import os
 import asyncio
+import atexit
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from playwright.async_api import async_playwright
 
+# Browsers kept warm, and how many renders each does before it is replaced
+BROWSER_POOL_SIZE = int(os.getenv('BROWSER_POOL_SIZE', 2))
+BROWSER_MAX_RENDERS = int(os.getenv('BROWSER_MAX_RENDERS', 100))
+RENDER_TIMEOUT_MS = 60000
+
+
+class _BrowserSlot:
+    """One pooled Chromium and the number of pages it has rendered"""
+
+    def __init__(self):
+        self.browser = None
+        self.renders = 0
+
+
+class BrowserPool:
+    """
+    Long-lived Playwright service running on its own event loop thread.
+
+    Chromium instances are launched once and reused; every render gets a
+    fresh browser context, so cookies and storage never leak between
+    requests. A browser is replaced after BROWSER_MAX_RENDERS renders or as
+    soon as it disconnects (crash, OOM kill).
+    """
+
+    def __init__(self, size=BROWSER_POOL_SIZE, max_renders=BROWSER_MAX_RENDERS):
+        self.size = size
+        self.max_renders = max_renders
+        self._loop = None
+        self._thread = None
+        self._playwright = None
+        self._slots = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._slots is not None and self._thread.is_alive():
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="browser-pool", daemon=True)
+            self._thread.start()
+            try:
+                asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+            except Exception:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join(timeout=5)
+                self._slots = None
+                raise
+
+    async def _start(self):
+        self._playwright = await async_playwright().start()
+        slots = asyncio.Queue()
+        for _ in range(self.size):
+            slot = _BrowserSlot()
+            try:
+                await self._launch(slot)
+            except Exception as e:
+                print(f"✗ Error launching pooled browser: {e}")  # Retried on first use
+            slots.put_nowait(slot)
+        self._slots = slots
+
+    async def _launch(self, slot):
+        if slot.browser is not None:
+            await self._close_browser(slot)
+        slot.browser = await self._playwright.chromium.launch(headless=True)
+        slot.renders = 0
+
+    @staticmethod
+    async def _close_browser(slot):
+        try:
+            await slot.browser.close()
+        except Exception:
+            pass
+        slot.browser = None
+
+    async def _render(self, url=None, output_path=None, html=None):
+        """
+        Prints ``url`` (or the ``html`` markup) to PDF. The PDF is written to
+        ``output_path`` if given; the bytes are returned either way.
+        """
+        slot = await self._slots.get()
+        try:
+            if slot.browser is None or not slot.browser.is_connected():
+                await self._launch(slot)
+            context = await slot.browser.new_context()
+            try:
+                page = await context.new_page()
+                # Set a reasonable timeout and wait for network idle
+                if html is not None:
+                    await page.set_content(html, wait_until="networkidle", timeout=RENDER_TIMEOUT_MS)
+                else:
+                    await page.goto(url, wait_until="networkidle", timeout=RENDER_TIMEOUT_MS)
+                # Use standard A4 format
+                pdf_bytes = await page.pdf(
+                    path=output_path,
+                    format="A4",
+                    print_background=True,
+                    margin={"top": "0px", "right": "0px", "bottom": "0px", "left": "0px"}
+                )
+            finally:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+            slot.renders += 1
+            if slot.renders >= self.max_renders:
+                await self._close_browser(slot)  # Relaunched on next use
+            return pdf_bytes
+        except Exception:
+            if slot.browser is not None and not slot.browser.is_connected():
+                slot.browser = None
+            raise
+        finally:
+            self._slots.put_nowait(slot)
+
+    def render(self, url, output_path, timeout=None):
+        """Renders ``url`` to a PDF file from any thread; raises on failure."""
+        return self._wait(self._render(url, output_path), timeout)
+
+    def render_html(self, html, timeout=None):
+        """Renders HTML markup straight to PDF bytes, without touching disk."""
+        return self._wait(self._render(html=html), timeout)
+
+    def _wait(self, coro, timeout):
+        self._ensure_started()
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    async def render_async(self, url, output_path):
+        """Same as render() but awaitable from another event loop."""
+        self._ensure_started()
+        future = asyncio.run_coroutine_threadsafe(self._render(url, output_path), self._loop)
+        return await asyncio.wrap_future(future)
+
+    def close(self):
+        if self._slots is None or not self._thread.is_alive():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._stop(), self._loop).result(10)
+        except Exception as e:
+            print(f"✗ Error stopping browser pool: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    async def _stop(self):
+        while self._slots is not None and not self._slots.empty():
+            slot = self._slots.get_nowait()
+            if slot.browser is not None:
+                await self._close_browser(slot)
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+
+browser_pool = BrowserPool()
+atexit.register(browser_pool.close)
+
+
 class URLToPDFConverter:
     """Utility to convert a website URL to a PDF file using Playwright"""
 
@@ -9,41 +173,43 @@ class URLToPDFConverter:
     async def convert(url, output_path):
         """
         Captures a website URL and saves it as a PDF.
-        
+
         Args:
             url (str): The website URL to capture.
             output_path (str): The file path to save the PDF.
-            
+
         Returns:
             bool: True if successful, False otherwise.
         """
         try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(headless=True)
-                page = await browser.new_page()
-                
-                # Set a reasonable timeout and wait for network idle
-                await page.goto(url, wait_until="networkidle", timeout=60000)
-                
-                # Use standard A4 format
-                await page.pdf(
-                    path=output_path,
-                    format="A4",
-                    print_background=True,
-                    margin={"top": "0px", "right": "0px", "bottom": "0px", "left": "0px"}
-                )
-                
-                await browser.close()
-                
-            if os.path.exists(output_path):
-                print(f"✓ URL converted to PDF: {output_path}")
-                return True
-            return False
-            
+            await browser_pool.render_async(url, output_path)
+            return URLToPDFConverter._check_output(output_path)
         except Exception as e:
             print(f"✗ Error converting URL to PDF: {e}")
             return False
 
+    @staticmethod
+    def _check_output(output_path):
+        if os.path.exists(output_path):
+            print(f"✓ URL converted to PDF: {output_path}")
+            return True
+        return False
+
 def sync_convert_url_to_pdf(url, output_path):
-    """Synchronous wrapper for async convert method"""
-    return asyncio.run(URLToPDFConverter.convert(url, output_path))
+    """Synchronous conversion on the shared browser pool"""
+    try:
+        browser_pool.render(url, output_path, timeout=RENDER_TIMEOUT_MS / 1000 * 2)
+        return URLToPDFConverter._check_output(output_path)
+    except Exception as e:
+        print(f"✗ Error converting URL to PDF: {e}")
+        return False
+
+def sync_convert_html_to_pdf_bytes(html):
+    """Converts HTML markup in memory; returns the PDF bytes, or None on failure"""
+    try:
+        pdf_bytes = browser_pool.render_html(html, timeout=RENDER_TIMEOUT_MS / 1000 * 2)
+        print(f"✓ HTML converted to PDF ({len(pdf_bytes)} bytes)")
+        return pdf_bytes
+    except Exception as e:
+        print(f"✗ Error converting HTML to PDF: {e}")
+        return None
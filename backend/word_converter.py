@@ -3,32 +3,92 @@ Word Converter Module
 Handles PDF ↔ Word conversions for the PDF editor
 """
 import os
-from typing import Optional
+import shutil
+import subprocess
+import tempfile
+from typing import Callable, Dict, Optional
 from pdf2docx import Converter
+from extraction import EXTRACT_WORKERS, _get_executor, split_pages
+from office_pool import OFFICE_CONVERT_TIMEOUT, find_soffice, office_pool
 import platform
 
+# Page ranges shorter than this are converted in-process
+WORD_PARALLEL_MIN_PAGES = int(os.getenv('WORD_PARALLEL_MIN_PAGES', 40))
+
+def _parse_word_pages(pdf_path: str, start: int, end: int) -> Dict:
+    """Worker entry point: parses pages start..end (1-based) and returns them in pdf2docx's stored form"""
+    cv = Converter(pdf_path)
+    try:
+        # Layout analysis looks at the whole document, so load every page but
+        # only parse this shard
+        cv.load_pages()
+        for page in cv.pages:
+            page.skip_parsing = not (start <= page.id + 1 <= end)
+        settings = cv.default_settings
+        cv.parse_document(**settings).parse_pages(**settings)
+        return cv.store()
+    finally:
+        cv.close()
+
+class ConversionCancelled(Exception):
+    """Raised between conversion stages once the caller's cancelled() check returns True"""
+
+def _check_cancelled(cancelled: Optional[Callable[[], bool]]):
+    if cancelled is not None and cancelled():
+        raise ConversionCancelled()
+
 class WordConverter:
     """Manages conversions between PDF and Word formats"""
     
     @staticmethod
-    def pdf_to_word(pdf_path: str, docx_path: str) -> bool:
+    def pdf_to_word(pdf_path: str, docx_path: str, start_page: Optional[int] = None,
+                    end_page: Optional[int] = None, workers: Optional[int] = None,
+                    cancelled: Optional[Callable[[], bool]] = None) -> bool:
         """
         Convert PDF to Word (.docx) format
         
+        Large ranges are parsed in parallel by the shared process pool, each
+        worker taking a contiguous shard of pages; the parsed pages are then
+        laid out into a single DOCX here. The output is written atomically,
+        so a reader never sees a partial file.
+        
         Args:
             pdf_path: Path to input PDF file
             docx_path: Path to output DOCX file
+            start_page: First page to convert (1-based), defaults to the first
+            end_page: Last page to convert (inclusive), defaults to the last
+            workers: Parallel workers, defaults to EXTRACT_WORKERS
+            cancelled: Polled between stages (and between parallel shards);
+                returning True stops the conversion without writing docx_path
             
         Returns:
             True if conversion successful, False otherwise
         """
+        temp_path = None
         try:
             # Create converter instance
             cv = Converter(pdf_path)
-            
-            # Convert PDF to DOCX
-            cv.convert(docx_path, start=0, end=None)
-            cv.close()
+            try:
+                page_count = len(cv.fitz_doc)
+                first = max(start_page or 1, 1)
+                last = min(end_page or page_count, page_count)
+                if first > last:
+                    raise ValueError(f"Empty page range {start_page}-{end_page}")
+                
+                fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(docx_path) or '.', suffix='.docx.tmp')
+                os.close(fd)
+                workers = workers or EXTRACT_WORKERS
+                _check_cancelled(cancelled)
+                if last - first + 1 >= WORD_PARALLEL_MIN_PAGES and workers > 1:
+                    WordConverter._convert_sharded(cv, pdf_path, temp_path, first, last, workers, cancelled)
+                else:
+                    # Convert PDF to DOCX (pdf2docx counts pages from zero, end exclusive)
+                    cv.convert(temp_path, start=first - 1, end=last)
+            finally:
+                cv.close()
+            _check_cancelled(cancelled)
+            os.replace(temp_path, docx_path)
+            temp_path = None
             
             # Verify output file was created
             if os.path.exists(docx_path):
@@ -38,9 +98,37 @@ class WordConverter:
                 print(f"✗ Conversion failed: Output file not created")
                 return False
                 
+        except ConversionCancelled:
+            print(f"✗ PDF to Word conversion cancelled: {pdf_path}")
+            return False
         except Exception as e:
             print(f"✗ Error converting PDF to Word: {e}")
             return False
+        finally:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    @staticmethod
+    def _convert_sharded(cv: Converter, pdf_path: str, docx_path: str, first: int, last: int, workers: int,
+                         cancelled: Optional[Callable[[], bool]] = None):
+        """Parses page shards in worker processes and builds the DOCX from their results"""
+        # pdf2docx's own multi_processing writes pages-<n>.json into the working
+        # directory, which breaks with concurrent conversions; shard ourselves
+        executor = _get_executor()
+        offset = first - 1
+        futures = [
+            executor.submit(_parse_word_pages, pdf_path, start + offset, end + offset)
+            for start, end in split_pages(last - first + 1, workers)
+        ]
+        try:
+            for future in futures:
+                cv.restore(future.result())
+                _check_cancelled(cancelled)
+        finally:
+            # Shards not yet started are dropped if we stopped early
+            for future in futures:
+                future.cancel()
+        cv.make_docx(docx_path, **cv.default_settings)
     
     @staticmethod
     def word_to_pdf(docx_path: str, pdf_path: str) -> bool:
@@ -63,24 +151,15 @@ class WordConverter:
                 convert(docx_path, pdf_path)
                 
             elif system in ["Linux", "Darwin"]:  # Darwin = macOS
-                # Use LibreOffice on Linux/Mac
-                import subprocess
-                subprocess.run([
-                    'libreoffice',
-                    '--headless',
-                    '--convert-to', 'pdf',
-                    '--outdir', os.path.dirname(pdf_path),
-                    docx_path
-                ], check=True)
-                
-                # LibreOffice creates file with same name as input
-                # Need to rename if output path is different
-                expected_output = os.path.join(
-                    os.path.dirname(pdf_path),
-                    os.path.splitext(os.path.basename(docx_path))[0] + '.pdf'
-                )
-                if expected_output != pdf_path and os.path.exists(expected_output):
-                    os.rename(expected_output, pdf_path)
+                # Use the pooled LibreOffice listeners, or a one-shot run without them
+                if office_pool.available():
+                    try:
+                        office_pool.convert(docx_path, pdf_path)
+                    except Exception as e:
+                        print(f"✗ Office pool conversion failed, retrying one-shot: {e}")
+                        WordConverter._word_to_pdf_one_shot(docx_path, pdf_path)
+                else:
+                    WordConverter._word_to_pdf_one_shot(docx_path, pdf_path)
             else:
                 raise Exception(f"Unsupported platform: {system}")
             
@@ -101,6 +180,32 @@ class WordConverter:
             print(f"✗ Error converting Word to PDF: {e}")
             return False
     
+    @staticmethod
+    def _word_to_pdf_one_shot(docx_path: str, pdf_path: str):
+        """Runs a throwaway LibreOffice process with a private profile"""
+        profile_dir = tempfile.mkdtemp(prefix="pdfsim-office-")
+        try:
+            # A private profile lets concurrent conversions run side by side
+            subprocess.run([
+                find_soffice() or 'libreoffice',
+                '--headless',
+                f'-env:UserInstallation=file://{profile_dir}',
+                '--convert-to', 'pdf',
+                '--outdir', os.path.dirname(pdf_path) or '.',
+                docx_path
+            ], check=True, timeout=OFFICE_CONVERT_TIMEOUT)
+        finally:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+        
+        # LibreOffice creates file with same name as input
+        # Need to rename if output path is different
+        expected_output = os.path.join(
+            os.path.dirname(pdf_path),
+            os.path.splitext(os.path.basename(docx_path))[0] + '.pdf'
+        )
+        if expected_output != pdf_path and os.path.exists(expected_output):
+            os.rename(expected_output, pdf_path)
+    
     @staticmethod
     def validate_pdf(pdf_path: str) -> bool:
         """Validate that a file is a valid PDF"""
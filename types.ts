@@ -78,6 +78,7 @@ export interface PDFPage {
   drawingData?: string; // Base64 image of the drawing layer
   elements: EditorElement[];
   blocks?: PDFBlock[]; // Original text blocks from PDF
+  textPending?: boolean; // Blocks not fetched yet (lazy upload); loaded per page in the background
   width?: number;
   height?: number;
 }
@@ -48,6 +48,18 @@ export const fetchWithRetry = async (url: string, options: RequestInit = {}, ret
     }
 };
 
+/**
+ * Fresh Idempotency-Key for one logical mutating request. Generate it once and
+ * pass it on every retry so the backend applies the change only once.
+ */
+export const newIdempotencyKey = (): string => {
+    if (typeof crypto !== 'undefined' && typeof crypto.randomUUID === 'function') {
+        return crypto.randomUUID();
+    }
+    // randomUUID is only available in secure contexts (HTTPS or localhost)
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}-${Math.random().toString(36).slice(2)}`;
+};
+
 /**
  * Silent ping to wake up the backend
  */
@@ -81,6 +93,8 @@ export interface BackendPageData {
 
 export interface UploadResponse {
     sessionId: string;
+    pageCount?: number;
+    lazy?: boolean; // true when uploaded with extract=lazy: pages carry sizes only
     pages: BackendPageData[];
     fonts?: Record<string, {
         object_id: number;
@@ -92,6 +106,9 @@ export interface UploadResponse {
 export const uploadPDFToBackend = async (file: File): Promise<UploadResponse> => {
     const formData = new FormData();
     formData.append('file', file);
+    // Sizes only: the first page can be shown before any text is extracted;
+    // spans are fetched per page with fetchPageText
+    formData.append('extract', 'lazy');
 
     const response = await fetch(`${API_BASE_URL}/upload`, {
         method: 'POST',
@@ -106,13 +123,30 @@ export const uploadPDFToBackend = async (file: File): Promise<UploadResponse> =>
 };
 
 /**
- * Convert PDF to Word format for editing
+ * Text spans of a single page, extracted on demand by the backend
+ */
+export const fetchPageText = async (
+    sessionId: string,
+    pageNumber: number
+): Promise<BackendPageData & { fonts?: UploadResponse['fonts'] }> => {
+    const response = await fetchWithRetry(`${API_BASE_URL}/pages/${encodeURIComponent(sessionId)}/${pageNumber}/text`);
+
+    if (!response.ok) {
+        throw new Error('Falha ao extrair texto da página');
+    }
+
+    return response.json();
+};
+
+/**
+ * Convert PDF to Word format for editing.
+ * Optionally limited to pages startPage..endPage (1-based, inclusive).
  */
-export const convertPdfToWord = async (sessionId: string): Promise<Blob> => {
+export const convertPdfToWord = async (sessionId: string, startPage?: number, endPage?: number): Promise<Blob> => {
     const response = await fetch(`${API_BASE_URL}/convert/pdf-to-word`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ sessionId })
+        body: JSON.stringify({ sessionId, startPage, endPage })
     });
 
     if (!response.ok) {
@@ -218,10 +252,12 @@ export const editTextAtRect = async (
     color?: number,
     origin?: [number, number]
 ): Promise<{ success: boolean }> => {
-    const response = await fetch(`${API_BASE_URL}/edit/rect`, {
+    // Retries reuse the same key, so an edit whose response was lost is not applied twice
+    const response = await fetchWithRetry(`${API_BASE_URL}/edit/rect`, {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
+            'Idempotency-Key': newIdempotencyKey(),
         },
         body: JSON.stringify({ 
             sessionId, 